@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""
+Benchmark of the parser of Packages.gz files (Debian repositories):
+the previous parser (readlines + regex) and iter_stanzas, on a synthetic
+Packages.gz file.
+
+Usage: bin/bench_debian_packages.py [stanzas [runs]]
+"""
+
+from __future__ import print_function
+
+import gzip
+from io import BufferedReader, TextIOWrapper
+import os
+import re
+import sys
+import tempfile
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weechat.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from weechat.debian.packages import iter_stanzas  # noqa: E402
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2.x
+    tracemalloc = None
+
+STANZA = (
+    'Package: pkg%(i)d\n'
+    'Source: src%(i)d\n'
+    'Version: 1.%(i)d-1\n'
+    'Architecture: amd64\n'
+    'Maintainer: Nobody <nobody@example.com>\n'
+    'Installed-Size: 123\n'
+    'Depends: libc6 (>= 2.14), libcurl4, libgcrypt20 (>= 1.6.1)\n'
+    'Filename: pool/main/p/pkg%(i)d_1.%(i)d-1_amd64.deb\n'
+    'Size: 1234\n'
+    'MD5sum: 0123456789abcdef0123456789abcdef\n'
+    'SHA256: 0123456789abcdef0123456789abcdef'
+    '0123456789abcdef0123456789abcdef\n'
+    'Section: net\n'
+    'Priority: optional\n'
+    'Description: Fast, light chat client\n'
+    ' this is a long description line\n'
+    ' .\n'
+    ' another line\n'
+    '\n'
+)
+
+
+def write_packages_gz(filename, count):
+    """Write a Packages.gz file with count stanzas."""
+    with gzip.open(filename, 'wb') as _file:
+        for i in range(count):
+            _file.write((STANZA % {'i': i}).encode('utf-8'))
+
+
+def parse_regex(filename):
+    """Previous parser: readlines + regex on each line."""
+    packages = []
+    with gzip.open(filename, 'rb') as _file:
+        package = {}
+        for line in _file.readlines():
+            line = line.strip().decode('utf-8')
+            if not line:
+                if package:
+                    packages.append(package)
+                package = {}
+            match = re.match('^([^ ]+): (.*)$', line)
+            if match:
+                package[match.group(1)] = match.group(2)
+    return packages
+
+
+def parse_stanzas(filename):
+    """Current parser: iter_stanzas on the decompressed stream."""
+    with TextIOWrapper(BufferedReader(gzip.open(filename, 'rb')),
+                       encoding='utf-8') as _file:
+        return [stanza.fields for stanza in iter_stanzas(_file)]
+
+
+def bench(function, filename, runs):
+    """Return best time (in seconds) and peak memory (bytes or None)."""
+    best = None
+    for _ in range(runs):
+        start = default_timer()
+        function(filename)
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if tracemalloc:
+        tracemalloc.start()
+        function(filename)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    """Main function."""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    handle, filename = tempfile.mkstemp(suffix='.gz')
+    os.close(handle)
+    try:
+        write_packages_gz(filename, count)
+        print('%d stanzas, best of %d runs' % (count, runs))
+        for function in (parse_regex, parse_stanzas):
+            best, peak = bench(function, filename, runs)
+            print('%-14s %8.1f ms, peak %s' % (
+                function.__name__ + ':', best * 1000,
+                '%.1f MB' % (peak / 1000000.0) if peak is not None else '?'))
+    finally:
+        os.unlink(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Deferred builds of generated files (indexes, strings to translate).
+
+A change in database only marks the build as pending (in table
+"PendingBuild"); the build itself is done once, when the transaction is
+committed, whatever the number of rows changed in the transaction.
+
+If a build fails, it remains pending and can be done later with the
+command "./manage.py build".
+"""
+
+from datetime import datetime
+import logging
+import threading
+
+from django.db import transaction
+
+from weechat.common.models import PendingBuild
+
+# functions to build files, by name
+BUILDERS = {}
+
+# names of builds scheduled in current thread (not done yet)
+_scheduled = threading.local()
+
+
+def register_build(name, function):
+    """Register a function to build files."""
+    BUILDERS[name] = function
+
+
+def _get_scheduled():
+    """Return set of names of builds scheduled in current thread."""
+    if not hasattr(_scheduled, 'names'):
+        _scheduled.names = set()
+    return _scheduled.names
+
+
+def run_build(name):
+    """Build files now; return True if OK, False if the build failed."""
+    start = datetime.now()
+    _get_scheduled().discard(name)
+    try:
+        BUILDERS[name]()
+    except:  # noqa: E722
+        logging.getLogger(__name__).exception('build "%s" failed', name)
+        return False
+    PendingBuild.objects.filter(name=name, date__lte=start).delete()
+    return True
+
+
+def _run_scheduled_build(name):
+    """Build files if not already done since the build was scheduled."""
+    if name in _get_scheduled():
+        run_build(name)
+
+
+def schedule_build(name):
+    """
+    Mark a build as pending; it is done once, when the current transaction
+    is committed (or immediately if there is no transaction in progress).
+    """
+    PendingBuild.objects.update_or_create(
+        name=name, defaults={'date': datetime.now()})
+    _get_scheduled().add(name)
+    transaction.on_commit(lambda: _run_scheduled_build(name))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Cache for values computed from database or files.
+
+The versions of data (see touch_version()) are stored in files (directory
+"cache/versions" of FILES_ROOT), so that they are shared by all processes
+(web server workers and management commands), whatever the cache backend.
+"""
+
+from hashlib import md5
+from io import open
+import os
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from weechat.common.index import AtomicFile
+from weechat.common.path import files_path_join
+
+
+def get_cache_key(*args):
+    """Return a cache key (valid for all cache backends) for the args."""
+    key = '/'.join('%s' % arg for arg in args)
+    return 'weechat:%s' % md5(key.encode('utf-8')).hexdigest()
+
+
+def get_cached(key, validator, function, timeout=None):
+    """
+    Return the value cached for this key if it was stored with the same
+    validator, otherwise compute it with function() and cache it.
+
+    The validator must change each time the value changes (for example
+    the result of get_file_key() for a file, or a serial number), so that
+    an outdated value is never returned, even if the cache is shared by
+    several processes.
+    """
+    cached = cache.get(key)
+    if cached is not None and cached[0] == validator:
+        return cached[1]
+    value = function()
+    cache.set(key, (validator, value), timeout)
+    return value
+
+
+def get_version_filename(name):
+    """Return the name of the file with the version of data "name"."""
+    return files_path_join('cache', 'versions', name)
+
+
+def read_version(name):
+    """Return the version of data "name" read in its file, None if error."""
+    try:
+        with open(get_version_filename(name), 'r',
+                  encoding='utf-8') as _file:
+            return float(_file.read())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def touch_version(name):
+    """
+    Change the version of data "name" (to call after each change of data);
+    the version is the time of the change (float, in seconds).
+
+    If the version can not be written, the current time is returned (so
+    that the data are never considered unchanged).
+    """
+    version = time.time()
+    previous = read_version(name)
+    if previous is not None and version <= previous:
+        version = previous + 0.000001
+    filename = get_version_filename(name)
+    try:
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        version_file = AtomicFile(filename)
+        version_file.file.write(('%.6f' % version).encode('utf-8'))
+        version_file.publish()
+    except (IOError, OSError):
+        return time.time()
+    return version
+
+
+def touch_version_on_commit(name):
+    """
+    Change the version of data "name" when the current transaction is
+    committed (immediately if there is no transaction in progress), so
+    that other processes do not read the data before the change.
+    """
+    transaction.on_commit(lambda: touch_version(name))
+
+
+def get_version(name):
+    """Return the version of data "name" (see touch_version())."""
+    version = read_version(name)
+    if version is None:
+        version = touch_version(name)
+    return version
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Checksums of files."""
+
+import hashlib
+from io import open
+
+# size of chunks read in files (in bytes)
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_file_checksums(filename, algorithms, chunk_size=CHUNK_SIZE):
+    """
+    Return checksums of a file as a dict {algorithm: hexdigest}, for
+    algorithms supported by hashlib (for example: "md5", "sha1", "sha256",
+    "sha512", "blake2b").
+
+    The file is read once, by chunks (the memory used does not depend on
+    the size of file). Raise IOError if the file can not be read.
+    """
+    digests = [(name, hashlib.new(name)) for name in algorithms]
+    with open(filename, 'rb') as _file:
+        while True:
+            chunk = _file.read(chunk_size)
+            if not chunk:
+                break
+            for _, digest in digests:
+                digest.update(chunk)
+    return {name: digest.hexdigest() for name, digest in digests}
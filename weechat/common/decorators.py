@@ -20,7 +20,15 @@
 
 """Decorators."""
 
+from datetime import datetime
 from functools import wraps
+from hashlib import md5
+
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from weechat.common.cache import get_version
+from weechat.common.path import get_file_key
 
 
 def disable_for_loaddata(signal_handler):
@@ -33,3 +41,35 @@ def disable_for_loaddata(signal_handler):
             return
         signal_handler(*args, **kwargs)
     return wrapper
+
+
+def conditional_view(names, files=None):
+    """
+    Decorator that answers "304 Not Modified" for a view (headers ETag and
+    Last-Modified) when the data used by the view did not change.
+
+    The data are the versions of "names" (see touch_version()) and the
+    files returned by the function "files" (if given); they are checked
+    without any request to the database.
+    """
+    def get_validators():
+        versions = [get_version(name) for name in names]
+        file_keys = [get_file_key(filename)
+                     for filename in (files() if files else [])]
+        return versions, file_keys
+
+    def etag_func(request, *args, **kwargs):
+        versions, file_keys = get_validators()
+        validators = '%s/%s/%s/%s' % (versions, file_keys, args,
+                                      sorted(kwargs.items()))
+        return '%s-%s' % (md5(validators.encode('utf-8')).hexdigest(),
+                          get_language())
+
+    def last_modified_func(request, *args, **kwargs):
+        versions, file_keys = get_validators()
+        dates = versions + [key[1] / 1000000000.0
+                            for key in file_keys if key]
+        return datetime.utcfromtimestamp(int(max(dates)))
+
+    return condition(etag_func=etag_func,
+                     last_modified_func=last_modified_func)
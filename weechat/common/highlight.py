@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Source files highlighted with pygments, cached on disk.
+
+The HTML is stored in directory "cache/highlight" of FILES_ROOT, in a file
+named after the checksum of the source and the pygments options, so it
+is never outdated. The least recently used files are removed when the
+size of the directory exceeds settings.HIGHLIGHT_CACHE_SIZE.
+"""
+
+from hashlib import sha256
+from io import open
+import os
+
+from django.conf import settings
+
+from weechat.common.index import AtomicFile
+from weechat.common.models import FileDigest
+from weechat.common.path import files_path_join
+
+LEXER_OPTIONS = {
+    'stripnl': True,
+    'encoding': 'utf-8',
+}
+
+FORMATTER_OPTIONS = {
+    'cssclass': 'pygments',
+    'linenos': 'table',
+}
+
+
+def get_highlight_cache_dir():
+    """Return the directory with the highlighted sources."""
+    return files_path_join('cache', 'highlight')
+
+
+def get_highlight_cache_filename(digest, lexer):
+    """Return the name of the file with the highlighted source."""
+    key = '%s/%s/%s/%s' % (
+        digest,
+        lexer,
+        sorted(LEXER_OPTIONS.items()),
+        sorted(FORMATTER_OPTIONS.items()),
+    )
+    return os.path.join(get_highlight_cache_dir(),
+                        '%s.html' % sha256(key.encode('utf-8')).hexdigest())
+
+
+def prune_highlight_cache(max_size):
+    """
+    Remove the least recently used files until the size of the cache
+    is lower or equal to max_size (in bytes).
+    """
+    files = []
+    size = 0
+    directory = get_highlight_cache_dir()
+    for name in os.listdir(directory):
+        if not name.endswith('.html'):
+            continue
+        filename = os.path.join(directory, name)
+        try:
+            fstat = os.stat(filename)
+        except OSError:
+            continue
+        files.append((fstat.st_mtime, filename, fstat.st_size))
+        size += fstat.st_size
+    files.sort()
+    for _, filename, file_size in files:
+        if size <= max_size:
+            break
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
+        size -= file_size
+
+
+def highlight_file(filename, lexer):
+    """
+    Return the content of a file highlighted with pygments (HTML), using
+    the cache if possible.
+
+    Raise IOError if the file can not be read.
+    """
+    digest = FileDigest.get(filename)
+    if digest is None:
+        raise IOError('unable to read file "%s"' % filename)
+    cache_filename = get_highlight_cache_filename(digest.sha256, lexer)
+    try:
+        with open(cache_filename, 'r', encoding='utf-8') as _file:
+            htmlsource = _file.read()
+        # the date of file is the date of last use (for the eviction)
+        os.utime(cache_filename, None)
+        return htmlsource
+    except (IOError, OSError):
+        pass
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    with open(filename, 'rb') as _file:
+        htmlsource = highlight(_file.read(),
+                               get_lexer_by_name(lexer, **LEXER_OPTIONS),
+                               HtmlFormatter(**FORMATTER_OPTIONS))
+    try:
+        directory = get_highlight_cache_dir()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        cache_file = AtomicFile(cache_filename)
+        cache_file.file.write(htmlsource.encode('utf-8'))
+        cache_file.publish()
+        prune_highlight_cache(settings.HIGHLIGHT_CACHE_SIZE)
+    except (IOError, OSError):
+        pass
+    return htmlsource
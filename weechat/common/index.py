@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Write index files (XML/JSON) for scripts and themes."""
+
+import filecmp
+import gzip
+import os
+import tempfile
+
+from weechat.common.path import files_path_join
+
+# os.replace is not available in python 2.x, where os.rename replaces
+# the target (on Unix)
+replace_file = getattr(os, 'replace', os.rename)
+
+
+class AtomicFile(object):
+    """
+    A file written in a temporary file (in the same directory), which
+    replaces the target file only when it is published: readers of the
+    file never see a partial content.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(filename),
+            prefix='.%s.' % os.path.basename(filename),
+            delete=False,
+        )
+
+    def is_unchanged(self):
+        """Close the temporary file and compare it with the target file."""
+        self.file.close()
+        try:
+            return filecmp.cmp(self.file.name, self.filename, shallow=False)
+        except OSError:
+            return False
+
+    def publish(self):
+        """
+        Close the temporary file and rename it to the target file, unless
+        the content is unchanged: then the target file is kept as-is (with
+        its date, used by clients to check if the file changed).
+        """
+        if self.is_unchanged():
+            self.discard()
+            return
+        os.chmod(self.file.name, 0o644)
+        replace_file(self.file.name, self.filename)
+
+    def discard(self):
+        """Close and remove the temporary file."""
+        self.file.close()
+        try:
+            os.unlink(self.file.name)
+        except OSError:
+            pass
+
+
+class IndexFile(object):
+    """A file and its gzipped version (".gz"), written at the same time."""
+
+    def __init__(self, filename):
+        self.file = AtomicFile(filename)
+        self.gzfile = AtomicFile(filename + '.gz')
+        self.gzstream = gzip.GzipFile(filename=os.path.basename(filename),
+                                      mode='wb', fileobj=self.gzfile.file)
+
+    def write(self, data):
+        """Write a string in the file and in the gzipped file."""
+        data = data.encode('utf-8')
+        self.file.file.write(data)
+        self.gzstream.write(data)
+
+    def publish(self):
+        """
+        Publish both files (if the content changed: the gzipped file is
+        never the same, because it contains the date of compression).
+        """
+        self.gzstream.close()
+        if self.file.is_unchanged():
+            self.discard()
+            return
+        self.file.publish()
+        self.gzfile.publish()
+
+    def discard(self):
+        """Discard both files."""
+        self.gzstream.close()
+        self.file.discard()
+        self.gzfile.discard()
+
+
+class IndexWriter(object):
+    """
+    Write files "<name>.xml", "<name>.json" and their gzipped version
+    in a single pass, items being added one by one (as XML and JSON
+    fragments).
+
+    It must be used as a context manager: files are published at the
+    end of the block, or discarded if an exception occurs.
+    """
+
+    def __init__(self, name, root):
+        self.root = root
+        self.count = 0
+        self.xml = IndexFile(files_path_join('%s.xml' % name))
+        self.json = IndexFile(files_path_join('%s.json' % name))
+
+    def __enter__(self):
+        self.xml.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                       '<%s>\n' % self.root)
+        self.json.write('[\n')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.xml.discard()
+            self.json.discard()
+            return
+        self.xml.write('</%s>\n' % self.root)
+        self.json.write('\n]\n')
+        self.xml.publish()
+        self.json.publish()
+
+    def add(self, xml, json):
+        """
+        Add an item: an XML fragment (with trailing new line) and a JSON
+        object (without trailing comma nor new line).
+        """
+        self.xml.write(xml)
+        self.json.write('%s%s' % (',\n' if self.count > 0 else '', json))
+        self.count += 1
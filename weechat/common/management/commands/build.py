@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Build generated files (pending builds or forced)."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from weechat.common.build import BUILDERS, run_build
+from weechat.common.models import PendingBuild
+
+
+class Command(BaseCommand):
+    """Build generated files (pending builds or forced)."""
+    help = ('Build generated files: pending builds by default, or the '
+            'given builds (forced).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', metavar='name',
+                            help='build to do (forced)')
+        parser.add_argument('-a', '--all', action='store_true',
+                            help='do all builds (forced)')
+        parser.add_argument('-l', '--list', action='store_true',
+                            help='list builds and pending builds, '
+                            'without building anything')
+
+    def handle(self, *args, **options):
+        pending = {build.name: build.date
+                   for build in PendingBuild.objects.all()}
+        if options['list']:
+            for name in sorted(set(BUILDERS) | set(pending)):
+                self.stdout.write('%-16s %s' % (
+                    name,
+                    'pending since %s' % pending[name] if name in pending
+                    else '-'))
+            return
+        if options['all']:
+            names = sorted(BUILDERS)
+        elif options['names']:
+            names = options['names']
+        else:
+            names = sorted(pending)
+        unknown = [name for name in names if name not in BUILDERS]
+        if unknown:
+            raise CommandError('unknown build: %s' % ', '.join(unknown))
+        errors = []
+        for name in names:
+            if run_build(name):
+                self.stdout.write('%s: OK' % name)
+            else:
+                errors.append(name)
+        if errors:
+            raise CommandError('build failed: %s' % ', '.join(errors))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Highlight sources of scripts and themes (fill the cache)."""
+
+from django.core.management.base import BaseCommand
+
+from weechat.common.highlight import highlight_file
+from weechat.common.path import files_path_join
+from weechat.scripts.models import Script
+from weechat.themes.models import Theme
+
+
+class Command(BaseCommand):
+    """Highlight sources of scripts and themes (fill the cache)."""
+    help = ('Highlight sources of all visible scripts and themes, to fill '
+            'the cache used by pages with sources.')
+
+    def handle(self, *args, **options):
+        sources = []
+        for script in Script.objects.filter(visible=1).order_by('id'):
+            sources.append((files_path_join(script.path(),
+                                            script.name_with_extension()),
+                            script.pygments_lexer()))
+        for theme in Theme.objects.filter(visible=1).order_by('id'):
+            sources.append((files_path_join(theme.path(), theme.name),
+                            'ini'))
+        errors = 0
+        for filename, lexer in sources:
+            try:
+                highlight_file(filename, lexer)
+            except:  # noqa: E722
+                self.stderr.write('unable to highlight "%s"' % filename)
+                errors += 1
+        self.stdout.write('%d files highlighted, %d errors' % (
+            len(sources) - errors, errors))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Common models."""
+
+import os
+
+from django.db import models
+
+from weechat.common.checksum import get_file_checksums
+from weechat.common.path import get_file_key
+
+# digests of files, by path: {path: (key, FileDigest)}
+FILE_DIGESTS = {}
+
+
+class FileDigest(models.Model):
+    """
+    Checksums of a file, computed again only if the size, date or inode
+    of the file changed.
+    """
+    path = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField()
+    mtime_ns = models.BigIntegerField()
+    inode = models.BigIntegerField()
+    md5 = models.CharField(max_length=32)
+    sha256 = models.CharField(max_length=64)
+
+    def __str__(self):
+        return '%s (%d bytes, md5: %s)' % (self.path, self.size, self.md5)
+
+    def __unicode__(self):  # python 2.x
+        return self.__str__()
+
+    def key(self):
+        """Return a tuple (size, mtime_ns, inode) for the digested file."""
+        return (self.size, self.mtime_ns, self.inode)
+
+    @staticmethod
+    def get(path):
+        """
+        Return the FileDigest of a file (None if the file can not be read),
+        reading the file only if it changed since the last call.
+        """
+        path = os.path.normpath(path)
+        key = get_file_key(path)
+        if key is None:
+            FILE_DIGESTS.pop(path, None)
+            return None
+        digest = FILE_DIGESTS.get(path)
+        if digest and digest[0] == key:
+            return digest[1]
+        digest = FileDigest.objects.filter(path=path).first()
+        if not digest or digest.key() != key:
+            try:
+                checksums = get_file_checksums(path, ('md5', 'sha256'))
+            except IOError:
+                return None
+            digest = FileDigest(path=path,
+                                size=key[0],
+                                mtime_ns=key[1],
+                                inode=key[2],
+                                md5=checksums['md5'],
+                                sha256=checksums['sha256'])
+            digest.save()
+        FILE_DIGESTS[path] = (key, digest)
+        return digest
+
+
+class PendingBuild(models.Model):
+    """A generated file (index, strings to translate) to build again."""
+    name = models.CharField(max_length=64, primary_key=True)
+    date = models.DateTimeField()
+
+    def __str__(self):
+        return '%s (%s)' % (self.name, self.date)
+
+    def __unicode__(self):  # python 2.x
+        return self.__str__()
+
+    class Meta:
+        ordering = ['date']
@@ -55,3 +55,19 @@ def media_path_join(*args):
 def repo_path_join(*args):
     """Join multiple paths after settings.REPO_DIR."""
     return __path_join(settings.REPO_DIR, *args)
+
+
+def get_file_key(filename):
+    """
+    Return a tuple (size, mtime_ns, inode) which changes each time the file
+    is updated or replaced, or None if the file does not exist.
+    """
+    try:
+        fstat = os.stat(filename)
+    except OSError:
+        return None
+    mtime_ns = getattr(fstat, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        # python 2.x
+        mtime_ns = int(fstat.st_mtime * 1000000000)
+    return (fstat.st_size, mtime_ns, fstat.st_ino)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Tests for common functions."""
+
+from datetime import datetime
+import gzip
+from io import open
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from weechat.common.index import IndexWriter
+from weechat.scripts.models import (
+    INDEX_FRAGMENTS,
+    Script,
+    build_scripts_files,
+)
+from weechat.themes.models import Theme, build_themes_files
+
+TESTDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'testdata')
+
+# scripts and themes of index files in testdata (files generated with the
+# code which was building the index files before IndexWriter); the last
+# script is legacy and the last theme is not visible: they are not in the
+# index files
+INDEX_SCRIPTS = (
+    ('test_one.py', (
+        ('visible', True),
+        ('popularity', 3),
+        ('name', 'test_one'),
+        ('version', '1.2'),
+        ('url', ''),
+        ('language', 'python'),
+        ('license', 'GPL3'),
+        ('md5sum', ''),
+        ('tags', 'buffer,py3k-ok'),
+        ('desc_en', 'A <simple> "test" script & more'),
+        ('comment', 'not in index'),
+        ('requirements', ''),
+        ('min_weechat', '0.3.0'),
+        ('max_weechat', ''),
+        ('author', u'Sébastien'),
+        ('mail', 'sebastien@example.com'),
+        ('added', (2019, 1, 2, 3, 4, 5)),
+        ('updated', (2019, 6, 7, 8, 9, 10)),
+    )),
+    ('test_two.pl', (
+        ('visible', True),
+        ('popularity', 0),
+        ('name', 'test_two'),
+        ('version', '0.1'),
+        ('url', ''),
+        ('language', 'perl'),
+        ('license', 'MIT'),
+        ('md5sum', ''),
+        ('tags', ''),
+        ('desc_en', 'It\'s fine'),
+        ('comment', ''),
+        ('requirements', 'curl'),
+        ('min_weechat', '1.0'),
+        ('max_weechat', '2.0'),
+        ('author', 'author'),
+        ('mail', 'author@example.org'),
+        ('added', (2019, 2, 3, 4, 5, 6)),
+        ('updated', None),
+    )),
+    ('test_legacy.py', (
+        ('visible', True),
+        ('popularity', 0),
+        ('name', 'test_legacy'),
+        ('version', '0.1'),
+        ('url', ''),
+        ('language', 'python'),
+        ('license', 'GPL3'),
+        ('md5sum', ''),
+        ('tags', ''),
+        ('desc_en', 'Legacy'),
+        ('comment', ''),
+        ('requirements', ''),
+        ('min_weechat', '0.2.0'),
+        ('max_weechat', '0.2.6'),
+        ('author', 'author'),
+        ('mail', 'author@example.org'),
+        ('added', (2009, 1, 1, 0, 0, 0)),
+        ('updated', None),
+    )),
+)
+INDEX_THEMES = (
+    ('test_one.theme', (
+        ('visible', True),
+        ('name', 'test_one.theme'),
+        ('version', '0.4.0'),
+        ('md5sum', ''),
+        ('desc', 'Dark <theme> & "colors"'),
+        ('comment', 'not in index'),
+        ('author', u'Sébastien'),
+        ('mail', 'sebastien@example.com'),
+        ('added', (2019, 3, 4, 5, 6, 7)),
+        ('updated', (2019, 4, 5, 6, 7, 8)),
+    )),
+    ('test_two.theme', (
+        ('visible', False),
+        ('name', 'test_two.theme'),
+        ('version', '1.0'),
+        ('md5sum', ''),
+        ('desc', 'Pending'),
+        ('comment', ''),
+        ('author', 'author'),
+        ('mail', 'author@example.org'),
+        ('added', (2019, 5, 6, 7, 8, 9)),
+        ('updated', None),
+    )),
+)
+
+# files built by build_scripts_files() and build_themes_files()
+INDEX_FILES = ('plugins.xml', 'plugins.json', 'themes.xml', 'themes.json')
+
+
+def read_file(filename):
+    """Return content of a file (bytes), uncompressed if it's gzipped."""
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename, 'rb') as _file:
+        return _file.read()
+
+
+def get_fields(fields):
+    """Return fields of a script/theme as a dict (with dates)."""
+    return {
+        key: datetime(*value) if isinstance(value, tuple) else value
+        for key, value in fields
+    }
+
+
+class IndexFilesTestCase(TestCase):
+    """Index files of scripts and themes (built with IndexWriter)."""
+
+    def setUp(self):
+        self.files_root = tempfile.mkdtemp()
+        self.project_root = tempfile.mkdtemp()
+        # files _i18n_*.py are written in a temporary directory
+        os.mkdir(os.path.join(self.project_root, 'scripts'))
+        self.settings = override_settings(FILES_ROOT=self.files_root,
+                                          BASE_DIR=self.project_root)
+        self.settings.enable()
+        INDEX_FRAGMENTS.clear()
+        for filename, fields in INDEX_SCRIPTS:
+            script = Script.objects.create(**get_fields(fields))
+            self.write_file(script.filename(), filename)
+        for filename, fields in INDEX_THEMES:
+            theme = Theme.objects.create(**get_fields(fields))
+            self.write_file(
+                os.path.join(self.files_root, theme.path(), theme.name),
+                filename)
+
+    def tearDown(self):
+        INDEX_FRAGMENTS.clear()
+        self.settings.disable()
+        shutil.rmtree(self.files_root)
+        shutil.rmtree(self.project_root)
+
+    @staticmethod
+    def write_file(filename, content):
+        """Write a script/theme file."""
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'w', encoding='utf-8') as _file:
+            _file.write(u'# %s\n' % content)
+
+    def get_index_stats(self):
+        """Return stats of index files: {filename: stat}."""
+        return {
+            name: os.stat(os.path.join(self.files_root, name))
+            for name in os.listdir(self.files_root)
+            if name.startswith(('plugins.', 'themes.'))
+        }
+
+    def test_golden_files(self):
+        """Files (plain and gzipped) are the same as in testdata."""
+        build_scripts_files()
+        build_themes_files()
+        for name in INDEX_FILES:
+            expected = read_file(os.path.join(TESTDATA_DIR, name))
+            for filename in (name, name + '.gz'):
+                self.assertEqual(
+                    read_file(os.path.join(self.files_root, filename)),
+                    expected, filename)
+
+    def test_unchanged_files(self):
+        """Files with same content are not replaced."""
+        build_scripts_files()
+        build_themes_files()
+        stats = self.get_index_stats()
+        INDEX_FRAGMENTS.clear()
+        build_scripts_files()
+        build_themes_files()
+        new_stats = self.get_index_stats()
+        self.assertEqual(sorted(new_stats), sorted(stats))
+        for name in INDEX_FILES:
+            for filename in (name, name + '.gz'):
+                self.assertEqual(
+                    (new_stats[filename].st_ino,
+                     new_stats[filename].st_mtime),
+                    (stats[filename].st_ino, stats[filename].st_mtime),
+                    filename)
+
+    def test_discard_on_error(self):
+        """No file is written if an exception occurs."""
+        with self.assertRaises(ValueError):
+            with IndexWriter('plugins', 'plugins') as index:
+                index.add('  <plugin id="1">\n  </plugin>\n',
+                          '  {\n    "id": "1"\n  }')
+                raise ValueError('error')
+        self.assertEqual(self.get_index_stats(), {})
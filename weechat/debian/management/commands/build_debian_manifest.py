@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Build the manifest of Debian repositories."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from weechat.debian.packages import build_manifest
+
+
+class Command(BaseCommand):
+    """Build the manifest of Debian repositories."""
+    help = ('Build the manifest with packages of all visible Debian '
+            'repositories (to run after each build of packages).')
+
+    def handle(self, *args, **options):
+        count, errors = build_manifest()
+        self.stdout.write('%d packages in manifest' % count)
+        if errors:
+            raise CommandError('unable to read: %s' % ', '.join(errors))
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Read Packages.gz files of Debian repositories, with a cache.
+
+A parsed Packages.gz file is kept in memory and in a JSON file (in
+directory "cache/debian" of FILES_ROOT), with the size, date and inode
+of the Packages.gz file: it is parsed again only when the file is
+replaced.
+
+The manifest (file "cache/debian/manifest.json" of FILES_ROOT, built by
+command "./manage.py build_debian_manifest") contains the packages of
+all visible repositories, so that they are read from a single file.
+"""
+
+import gzip
+from hashlib import md5
+from io import BufferedReader, open, TextIOWrapper
+import json
+import os
+
+from weechat.common.index import AtomicFile
+from weechat.common.path import files_path_join, get_file_key, repo_path_join
+from weechat.debian.models import Repo
+
+# version of format of JSON files (to change if the parser changes)
+PACKAGES_CACHE_VERSION = 1
+
+# parsed Packages.gz files, by path: {path: (key, packages)}
+PACKAGES_INDEXES = {}
+
+# fields of packages kept in the manifest
+MANIFEST_FIELDS = ('Package', 'Source', 'Version', 'Architecture',
+                   'Filename')
+
+# manifest loaded: [key, manifest]
+MANIFEST = [None, None]
+
+
+class Stanza(object):
+    """A stanza of a Debian control file (for example a package)."""
+
+    __slots__ = ('fields', 'lineno')
+
+    def __init__(self, lineno):
+        self.fields = {}
+        self.lineno = lineno
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def get(self, name, default=None):
+        """Return value of a field, default if the field is not set."""
+        return self.fields.get(name, default)
+
+
+def iter_stanzas(lines):
+    """
+    Yield stanzas (Stanza objects) read from lines of a Debian control
+    file (iterable of strings).
+
+    The value of a multi-line field (continuation lines begin with a
+    space or a tab) has one line per line in the file, without the
+    leading space; a line with a single "." is an empty line.
+    """
+    stanza = None
+    name = None
+    for lineno, line in enumerate(lines, 1):
+        line = line.rstrip()
+        if not line:
+            if stanza is not None:
+                yield stanza
+            stanza = None
+            name = None
+        elif line[0] in ' \t':
+            if name is not None:
+                line = line[1:]
+                stanza.fields[name] += '\n%s' % ('' if line == '.' else line)
+        elif line[0] != '#':
+            if stanza is None:
+                stanza = Stanza(lineno)
+            name, _, value = line.partition(':')
+            stanza.fields[name] = value.strip()
+    if stanza is not None:
+        yield stanza
+
+
+def parse_packages_gz(filename, repo_name):
+    """
+    Parse a Packages.gz file and return a list of packages, each package
+    being a tuple (fields, size, mtime): the fields of package (dict) and
+    the size/date of the .deb file.
+    """
+    packages = []
+    # BufferedReader: GzipFile has no method read1 with python 2.x
+    with TextIOWrapper(BufferedReader(gzip.open(filename, 'rb')),
+                       encoding='utf-8') as _file:
+        for stanza in iter_stanzas(_file):
+            fstat = os.stat(repo_path_join(repo_name, stanza['Filename']))
+            packages.append((stanza.fields, fstat.st_size, fstat.st_mtime))
+    return packages
+
+
+def get_packages_cache_filename(filename):
+    """Return the name of the JSON file with a parsed Packages.gz file."""
+    return files_path_join(
+        'cache', 'debian',
+        '%s.json' % md5(filename.encode('utf-8')).hexdigest())
+
+
+def read_packages_cache(filename, key):
+    """
+    Return packages from the JSON file for a Packages.gz file, None if
+    the JSON file does not exist or was made with another Packages.gz.
+    """
+    try:
+        with open(get_packages_cache_filename(filename), 'r',
+                  encoding='utf-8') as _file:
+            content = json.load(_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if content.get('version') != PACKAGES_CACHE_VERSION or \
+            content.get('key') != list(key):
+        return None
+    return [tuple(package) for package in content['packages']]
+
+
+def write_packages_cache(filename, key, packages):
+    """Write packages of a Packages.gz file in a JSON file."""
+    cache_filename = get_packages_cache_filename(filename)
+    try:
+        directory = os.path.dirname(cache_filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        cache_file = AtomicFile(cache_filename)
+        cache_file.file.write(json.dumps({
+            'version': PACKAGES_CACHE_VERSION,
+            'path': filename,
+            'key': list(key),
+            'packages': packages,
+        }).encode('utf-8'))
+        cache_file.publish()
+    except (IOError, OSError):
+        pass
+
+
+def get_packages(filename, repo_name):
+    """
+    Return packages of a Packages.gz file (see parse_packages_gz), using
+    the cache if the file has not changed.
+    """
+    key = get_file_key(filename)
+    if key is None:
+        PACKAGES_INDEXES.pop(filename, None)
+        raise IOError('file not found: "%s"' % filename)
+    index = PACKAGES_INDEXES.get(filename)
+    if index and index[0] == key:
+        return index[1]
+    packages = read_packages_cache(filename, key)
+    if packages is None:
+        packages = parse_packages_gz(filename, repo_name)
+        write_packages_cache(filename, key, packages)
+    PACKAGES_INDEXES[filename] = (key, packages)
+    return packages
+
+
+def get_manifest_filename():
+    """Return the name of the manifest file."""
+    return files_path_join('cache', 'debian', 'manifest.json')
+
+
+def build_manifest():
+    """
+    Build the manifest with packages of all visible repositories and
+    return the number of packages and the list of Packages.gz files that
+    could not be read.
+    """
+    entries = {}
+    count = 0
+    errors = []
+    for repository in (Repo.objects.filter(visible=1)
+                       .select_related('version')):
+        for arch in repository.arch.split(','):
+            filename = repository.path_packages_gz(arch)
+            key = get_file_key(filename)
+            try:
+                packages = [
+                    ({name: fields[name]
+                      for name in MANIFEST_FIELDS if name in fields},
+                     size, mtime)
+                    for fields, size, mtime in parse_packages_gz(
+                        filename, repository.name)
+                ]
+            except:  # noqa: E722
+                key = None
+                packages = None
+                errors.append(filename)
+            entries[filename] = {
+                'key': list(key) if key else None,
+                'packages': packages,
+            }
+            count += len(packages or [])
+    manifest_filename = get_manifest_filename()
+    directory = os.path.dirname(manifest_filename)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest_file = AtomicFile(manifest_filename)
+    manifest_file.file.write(json.dumps({
+        'version': PACKAGES_CACHE_VERSION,
+        'entries': entries,
+    }, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+    manifest_file.publish()
+    return count, errors
+
+
+def get_manifest():
+    """
+    Return the manifest (dict), loaded again only if the file changed,
+    None if there is no manifest.
+    """
+    key = get_file_key(get_manifest_filename())
+    if key != MANIFEST[0]:
+        manifest = None
+        if key is not None:
+            try:
+                with open(get_manifest_filename(), 'r',
+                          encoding='utf-8') as _file:
+                    manifest = json.load(_file)
+            except (IOError, OSError, ValueError):
+                pass
+        if manifest and manifest.get('version') != PACKAGES_CACHE_VERSION:
+            manifest = None
+        MANIFEST[:] = [key, manifest]
+    return MANIFEST[1]
+
+
+def is_manifest_up_to_date(manifest, repository, arch):
+    """
+    Return True if the manifest is up-to-date for the Packages.gz file of
+    a repository/architecture.
+    """
+    filename = repository.path_packages_gz(arch)
+    entry = (manifest or {}).get('entries', {}).get(filename)
+    if entry is None:
+        return False
+    key = get_file_key(filename)
+    return entry['key'] == (list(key) if key else None)
+
+
+def get_repository_arch_packages(repository, arch, manifest=None):
+    """
+    Return packages of a repository/architecture (see parse_packages_gz),
+    read from the manifest if it is up-to-date for this Packages.gz file.
+
+    Raise IOError if the Packages.gz file can not be read.
+    """
+    filename = repository.path_packages_gz(arch)
+    entry = (manifest or {}).get('entries', {}).get(filename)
+    if entry is not None:
+        key = get_file_key(filename)
+        if entry['key'] == (list(key) if key else None):
+            if entry['packages'] is None:
+                raise IOError('unable to read "%s"' % filename)
+            return [tuple(package) for package in entry['packages']]
+    return get_packages(filename, repository.name)
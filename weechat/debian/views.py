@@ -21,79 +21,80 @@
 """Views for Debian repositories."""
 
 from datetime import datetime, timedelta
-import gzip
+from multiprocessing.pool import ThreadPool
 import os
 import pytz
-import re
 
 from django.conf import settings
 from django.shortcuts import render
 
-from weechat.common.path import repo_path_join
 from weechat.debian.models import Repo
+from weechat.debian.packages import (
+    get_manifest,
+    get_repository_arch_packages,
+    is_manifest_up_to_date,
+)
 
+# max number of repositories/architectures scanned at same time
+SCAN_THREADS = 8
 
-def get_repository_packages(repository):
-    """Get list of packages for a repository."""
+
+def get_repository_packages(repository, archs=None, manifest=None):
+    """
+    Get list of packages for a repository (all architectures or only the
+    given ones), using the manifest if given.
+    """
     timezone = pytz.timezone(settings.TIME_ZONE)
     now = datetime.now(tz=timezone)
     repopkgs = []
-    for arch in repository.arch.split(','):
-        build = {
-            'id': '%s_%s' % (repository.name, repository.version.version),
-            'repo': repository,
-            'arch': arch,
-            'date': None,
-            'files': [],
-        }
-        filename = repository.path_packages_gz(arch)
-        build['date'] = os.stat(filename).st_mtime
-        with gzip.open(filename, 'rb') as _file:
-            pkg = {}
-            for line in _file.readlines():
-                line = line.strip().decode('utf-8')
-                if len(line) == 0:
-                    if pkg:
-                        pkg['repoarch'] = '%s_%s' % (
-                            repository.name,
-                            repository.version.codename,
-                        )
-                        pkg['repo'] = repository
-                        pkg['distro'] = repository.name
-                        pkg['arch'] = arch
-                        pkgfilename = repo_path_join(repository.name,
-                                                     pkg['Filename'])
-                        fstat = os.stat(pkgfilename)
-                        pkg['size'] = fstat.st_size
-                        date_time = datetime.fromtimestamp(fstat.st_mtime,
-                                                           tz=timezone)
-                        pkg['builddatetime'] = date_time
-                        add_hours = repository.build_frequency
-                        if repository.active and add_hours > 0:
-                            nextbuilddatetime = (date_time +
-                                                 timedelta(hours=add_hours))
-                            if nextbuilddatetime > now:
-                                pkg['nextbuilddatetime'] = nextbuilddatetime
-                        pkg['basename'] = os.path.basename(pkg['Filename'])
-                        pkg['anchor'] = '%s_%s_%s_%s' % (
-                            repository.name,
-                            repository.version.codename,
-                            pkg['Version'],
-                            arch,
-                        )
-                        if 'Source' not in pkg:
-                            pkg['Source'] = pkg['Package']
-                        pkg['version_type'] = ('dev'
-                                               if 'dev' in pkg['Version']
-                                               else 'stable')
-                        repopkgs.append(pkg)
-                    pkg = {}
-                match = re.match('^([^ ]+): (.*)$', line)
-                if match:
-                    pkg[match.group(1)] = match.group(2)
+    for arch in archs or repository.arch.split(','):
+        for fields, size, mtime in get_repository_arch_packages(
+                repository, arch, manifest):
+            pkg = dict(fields)
+            pkg['repoarch'] = '%s_%s' % (
+                repository.name,
+                repository.version.codename,
+            )
+            pkg['repo'] = repository
+            pkg['distro'] = repository.name
+            pkg['arch'] = arch
+            pkg['size'] = size
+            date_time = datetime.fromtimestamp(mtime, tz=timezone)
+            pkg['builddatetime'] = date_time
+            add_hours = repository.build_frequency
+            if repository.active and add_hours > 0:
+                nextbuilddatetime = (date_time +
+                                     timedelta(hours=add_hours))
+                if nextbuilddatetime > now:
+                    pkg['nextbuilddatetime'] = nextbuilddatetime
+            pkg['basename'] = os.path.basename(pkg['Filename'])
+            pkg['anchor'] = '%s_%s_%s_%s' % (
+                repository.name,
+                repository.version.codename,
+                pkg['Version'],
+                arch,
+            )
+            if 'Source' not in pkg:
+                pkg['Source'] = pkg['Package']
+            pkg['version_type'] = ('dev'
+                                   if 'dev' in pkg['Version']
+                                   else 'stable')
+            repopkgs.append(pkg)
     return repopkgs
 
 
+def scan_repository_arch(repository_arch_manifest):
+    """
+    Get list of packages for a tuple (repository, arch, manifest), None if
+    the repository can not be read.
+    """
+    repository, arch, manifest = repository_arch_manifest
+    try:
+        return get_repository_packages(repository, [arch], manifest)
+    except:  # noqa: E722
+        return None
+
+
 def repos(request, active='active', files=''):
     """Page with debian repositories."""
     if active == 'active':
@@ -102,16 +103,49 @@ def repos(request, active='active', files=''):
     else:
         repositories = (Repo.objects.all().filter(visible=1)
                         .order_by('priority'))
+    # version and builder are read here, so that threads below do not
+    # make any request to the database
+    repositories = list(repositories.select_related('version', 'builder'))
+    manifest = get_manifest()
+    scans = [(repository, arch, manifest)
+             for repository in repositories
+             for arch in repository.arch.split(',')]
+    # repositories up-to-date in the manifest are read from the manifest,
+    # the others are read from Packages.gz files in threads
+    scan_results = [
+        scan_repository_arch(scan)
+        if is_manifest_up_to_date(manifest, scan[0], scan[1]) else None
+        for scan in scans
+    ]
+    stale = [index for index, scan in enumerate(scans)
+             if scan_results[index] is None]
+    if stale:
+        pool = ThreadPool(max(1, min(SCAN_THREADS, len(stale))))
+        try:
+            for index, packages in zip(
+                    stale,
+                    pool.map(scan_repository_arch,
+                             [scans[index] for index in stale])):
+                scan_results[index] = packages
+        finally:
+            pool.close()
+            pool.join()
+    results = {}
+    for (repository, _, _), packages in zip(scans, scan_results):
+        results.setdefault(repository.id, []).append(packages)
     debpkgs = []
     errors = []
     for repository in repositories:
-        try:
-            repo_packages = get_repository_packages(repository)
-            debpkgs.extend(sorted(repo_packages,
-                                  key=lambda p: p['builddatetime'],
-                                  reverse=True))
-        except:  # noqa: E722
+        repo_results = results.get(repository.id, [])
+        if None in repo_results:
             errors.append('%s %s' % (repository.name, repository.version))
+            continue
+        repo_packages = []
+        for packages in repo_results:
+            repo_packages.extend(packages)
+        debpkgs.extend(sorted(repo_packages,
+                              key=lambda p: p['builddatetime'],
+                              reverse=True))
     return render(
         request,
         'download/debian.html',
@@ -26,7 +26,7 @@ from django.db import models
 
 from weechat.common.tracker import commits_links, tracker_links
 from weechat.common.templatetags.localdate import localdate
-from weechat.download.models import Release
+from weechat.download.models import get_release
 
 
 class Task(models.Model):
@@ -63,7 +63,7 @@ class Task(models.Model):
         It is prefixed with "≈ " if the date is in the future.
         """
         try:
-            release_date = Release.objects.get(version=self.version).date
+            release_date = get_release(self.version).date
             if release_date > date.today():
                 return '&asymp; %s' % localdate(release_date)
             return localdate(release_date)
@@ -27,10 +27,11 @@ from django.http import HttpResponse
 from django.shortcuts import render
 from django.utils.translation import ugettext, ugettext_lazy
 
+from weechat.common.decorators import conditional_view
 from weechat.common.path import files_path_join, media_path_join
 from weechat.common.templatetags.version import version_as_int
 from weechat.dev.models import Task
-from weechat.download.models import Release
+from weechat.download.models import get_release
 
 INFO_KEYS = (
     (
@@ -117,8 +118,8 @@ def roadmap(request, allversions=False):
                          .order_by('version', 'priority'))
         else:
             task_list = (Task.objects.all().filter(visible=1)
-                         .filter(version__gt=Release.objects.get(
-                             version='stable').description)
+                         .filter(version__gt=get_release(
+                             'stable').description)
                          .order_by('version', 'priority'))
     except ObjectDoesNotExist:
         task_list = None
@@ -247,12 +248,22 @@ def get_info(name, version):
     return ''
 
 
+def get_info_files():
+    """Return the files used to get infos."""
+    return [
+        files_path_join('git_sources_head.txt'),
+        files_path_join('git_scripts_head.txt'),
+    ] + [media_path_join('pgp', fingerprint)
+         for fingerprint in sorted(PGP_KEYS.values())]
+
+
+@conditional_view(['releases'], get_info_files)
 def info(request, name=None):
     """Page with one or all available infos."""
     try:
         version = {
-            'stable': Release.objects.get(version='stable'),
-            'devel': Release.objects.get(version='devel'),
+            'stable': get_release('stable'),
+            'devel': get_release('devel'),
         }
     except ObjectDoesNotExist:
         return render(
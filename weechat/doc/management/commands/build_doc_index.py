@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Update the search index of documentation."""
+
+from django.core.management.base import BaseCommand
+
+from weechat.doc.search import update_search_index
+
+
+class Command(BaseCommand):
+    """Update the search index of documentation."""
+    help = ('Update the search index of documentation with docs changed '
+            'since the last update (to run after each update of docs).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='index all docs (not only the changed ones)')
+
+    def handle(self, *args, **options):
+        indexed, removed, unchanged = update_search_index(
+            full=options['full'])
+        self.stdout.write('%d docs indexed, %d removed, %d unchanged' % (
+            indexed, removed, unchanged))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Build the manifest of documentation files."""
+
+from django.core.management.base import BaseCommand
+
+from weechat.doc.manifest import build_doc_manifest
+
+
+class Command(BaseCommand):
+    """Build the manifest of documentation files."""
+    help = ('Build the manifest of documentation files (to run after each '
+            'update of docs).')
+
+    def handle(self, *args, **options):
+        manifest = build_doc_manifest()
+        self.stdout.write('%d files in manifest' % sum(
+            len(content['files'])
+            for content in manifest['directories'].values()))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Refresh HTML with links of security vulnerabilities."""
+
+from django.core.management.base import BaseCommand
+
+from weechat.doc.models import Security
+
+LINKS_FIELDS = ('external_html', 'tracker_html', 'commits_html')
+
+
+class Command(BaseCommand):
+    """Refresh HTML with links of security vulnerabilities."""
+    help = ('Refresh HTML with links to CVE, tracker items and commits of '
+            'security vulnerabilities (to run after an upgrade or a change '
+            'of MEDIA_URL).')
+
+    def handle(self, *args, **options):
+        count = 0
+        for security in Security.objects.all():
+            old = [getattr(security, field) for field in LINKS_FIELDS]
+            security.refresh_links()
+            new = [getattr(security, field) for field in LINKS_FIELDS]
+            if new != old:
+                # update only links (no signal: strings to translate and
+                # data version do not change)
+                Security.objects.filter(pk=security.pk).update(
+                    **dict(zip(LINKS_FIELDS, new)))
+                count += 1
+        self.stdout.write('%d security vulnerabilities updated' % count)
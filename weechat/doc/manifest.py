@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Manifest of documentation files.
+
+The manifest (file "cache/doc/manifest.json" of FILES_ROOT, built by
+command "./manage.py build_doc_manifest") contains the files (with their
+date) of directory "doc" of FILES_ROOT and of its sub-directories, so that
+the docs available are known without reading the directories.
+
+The manifest is loaded again when its file changes, and built again if
+one of these directories has changed (a file added, removed or renamed).
+A doc overwritten in place does not change its directory: the command
+must be run after docs are published.
+"""
+
+from io import open
+import json
+import os
+
+from weechat.common.index import AtomicFile
+from weechat.common.path import files_path_join, get_file_key
+
+# version of format of manifest (to change if the format changes)
+DOC_MANIFEST_VERSION = 1
+
+# manifest loaded: [key, manifest]
+DOC_MANIFEST = [None, None]
+
+# shortcuts to docs: [key, manifest, {(version, name, lang): URL}]
+DOC_SHORTCUTS = [None, None, {}]
+
+
+def get_doc_manifest_filename():
+    """Return the name of the manifest file."""
+    return files_path_join('cache', 'doc', 'manifest.json')
+
+
+def scan_doc_directory(directory):
+    """
+    Return files of a directory in "doc" ('' for "doc" itself) as a dict
+    with the key of directory and the date of each file, None if the
+    directory can not be read.
+    """
+    path = files_path_join('doc', directory)
+    key = get_file_key(path)
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return None
+    files = {}
+    for name in names:
+        try:
+            files[name] = os.path.getmtime(os.path.join(path, name))
+        except OSError:
+            pass
+    return {
+        'key': list(key) if key else None,
+        'files': files,
+    }
+
+
+def build_doc_manifest():
+    """Build the manifest of documentation files and return it."""
+    directories = {}
+    root = scan_doc_directory('')
+    if root is not None:
+        directories[''] = root
+        for name in sorted(root['files']):
+            if os.path.isdir(files_path_join('doc', name)):
+                content = scan_doc_directory(name)
+                if content is not None:
+                    directories[name] = content
+    manifest = {
+        'version': DOC_MANIFEST_VERSION,
+        'directories': directories,
+    }
+    manifest_filename = get_doc_manifest_filename()
+    try:
+        directory = os.path.dirname(manifest_filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        manifest_file = AtomicFile(manifest_filename)
+        manifest_file.file.write(json.dumps(
+            manifest, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+        manifest_file.publish()
+    except (IOError, OSError):
+        pass
+    DOC_MANIFEST[:] = [get_file_key(manifest_filename), manifest]
+    return manifest
+
+
+def is_doc_file(filename):
+    """Return True if the file is a doc ("weechat_*.html")."""
+    return filename.startswith('weechat_') and filename.endswith('.html')
+
+
+def is_doc_manifest_outdated(manifest):
+    """Return True if a directory changed since the manifest was built."""
+    directories = manifest['directories']
+    root_key = get_file_key(files_path_join('doc'))
+    if root_key is None or '' not in directories:
+        return root_key is not None or bool(directories)
+    for name, content in directories.items():
+        key = get_file_key(files_path_join('doc', name))
+        if content['key'] != (list(key) if key else None):
+            return True
+    return False
+
+
+def get_doc_manifest():
+    """
+    Return the manifest (dict), loaded again only if the file changed,
+    and built again if a directory of docs changed (or if the file can
+    not be read).
+    """
+    key = get_file_key(get_doc_manifest_filename())
+    # if the manifest could not be written, the manifest in memory is used
+    if key != DOC_MANIFEST[0] or DOC_MANIFEST[1] is None:
+        manifest = None
+        if key is not None:
+            try:
+                with open(get_doc_manifest_filename(), 'r',
+                          encoding='utf-8') as _file:
+                    manifest = json.load(_file)
+            except (IOError, OSError, ValueError):
+                pass
+        if manifest and manifest.get('version') != DOC_MANIFEST_VERSION:
+            manifest = None
+        DOC_MANIFEST[:] = [key, manifest]
+    manifest = DOC_MANIFEST[1]
+    if manifest is None or is_doc_manifest_outdated(manifest):
+        manifest = build_doc_manifest()
+    return manifest
+
+
+def get_doc_files(directory, manifest=None):
+    """
+    Return files of a directory in "doc" ('' for "doc" itself) as a dict
+    {name: date}, None if the directory does not exist.
+    """
+    manifest = manifest or get_doc_manifest()
+    content = manifest['directories'].get(directory)
+    return content['files'] if content is not None else None
+
+
+def get_doc_file_date(filename, manifest=None):
+    """
+    Return the date (timestamp) of a file in "doc" (path relative to
+    "doc"), None if the file does not exist.
+    """
+    directory, name = os.path.split(os.path.normpath(filename))
+    files = get_doc_files(directory, manifest)
+    return files.get(name) if files is not None else None
+
+
+def build_doc_shortcuts(manifest):
+    """
+    Return URLs of docs in the manifest: {(version, name, lang): URL}.
+    """
+    shortcuts = {}
+    for directory, content in manifest['directories'].items():
+        if not directory:
+            continue
+        for filename in content['files']:
+            if not is_doc_file(filename):
+                continue
+            name, _, lang = filename[8:-5].rpartition('.')
+            if not name or not lang:
+                continue
+            shortcuts[(directory, name, lang)] = '/files/doc/%s/%s' % (
+                directory, filename)
+    return shortcuts
+
+
+def get_doc_url(version, name, lang):
+    """
+    Return URL of a doc, or of the English doc if the doc is not available
+    in this language, None if the doc does not exist.
+    """
+    # the shortcuts are checked only with the key of manifest file (the
+    # directories of docs are not checked)
+    key = get_file_key(get_doc_manifest_filename())
+    if key != DOC_SHORTCUTS[0] or DOC_SHORTCUTS[1] is None or \
+            DOC_SHORTCUTS[1] is not DOC_MANIFEST[1]:
+        manifest = get_doc_manifest()
+        DOC_SHORTCUTS[:] = [DOC_MANIFEST[0], manifest,
+                            build_doc_shortcuts(manifest)]
+    shortcuts = DOC_SHORTCUTS[2]
+    return (shortcuts.get((version, name, lang)) or
+            shortcuts.get((version, name, 'en')))
@@ -20,10 +20,13 @@
 
 """Models for "doc" menu."""
 
+import re
+
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.utils.translation import ugettext, ugettext_noop
 
+from weechat.common.cache import touch_version_on_commit
 from weechat.common.i18n import i18n_autogen
 from weechat.common.templatetags.localdate import localdate
 from weechat.common.tracker import commits_links, tracker_links
@@ -44,6 +47,12 @@ SECURITY_SEVERITIES = (
 )
 
 
+def get_version_tuple(version):
+    """Return a version as a tuple of integers (to compare versions)."""
+    return tuple(int(number)
+                 for number in re.findall(r'[0-9]+', version.split('-')[0]))
+
+
 class Language(models.Model):
     """A language with at least one translated doc."""
     LANG_I18N = {
@@ -138,6 +147,10 @@ class Security(models.Model):
     commits = models.CharField(max_length=1024, blank=True)
     description = models.TextField()
     workaround = models.TextField(blank=True)
+    # links as HTML, see refresh_links()
+    external_html = models.TextField(blank=True, editable=False)
+    tracker_html = models.TextField(blank=True, editable=False)
+    commits_html = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         return '%s, %s, %s, %s / %s, %s, %s' % (
@@ -156,15 +169,29 @@ class Security(models.Model):
         """Return the date formatted with localized date format."""
         return localdate(self.date)
 
+    def refresh_links(self):
+        """
+        Build HTML with links to CVE, tracker items and commits (the
+        security is not saved).
+        """
+        if self.external.startswith('CVE'):
+            self.external_html = CVE_URL % {'cve': self.external}
+        else:
+            self.external_html = self.external
+        self.tracker_html = tracker_links(self.tracker)
+        self.commits_html = commits_links(self.commits)
+
     def external_links(self):
         """Return URL to CVE (or "external" as-is if it's not a CVE)."""
-        if self.external.startswith('CVE'):
-            return CVE_URL % {'cve': self.external}
-        return self.external
+        if self.external and not self.external_html:
+            self.refresh_links()
+        return self.external_html
 
     def url_tracker(self):
         """Return URL with links to tracker items."""
-        return tracker_links(self.tracker)
+        if self.tracker and not self.tracker_html:
+            self.refresh_links()
+        return self.tracker_html
 
     def severity_i18n(self):
         """Return translated severity."""
@@ -193,7 +220,29 @@ class Security(models.Model):
 
     def url_commits(self):
         """Return URL with links to commits."""
-        return commits_links(self.commits)
+        if self.commits and not self.commits_html:
+            self.refresh_links()
+        return self.commits_html
+
+    def affected_versions(self):
+        """
+        Return the first and last affected versions (tuple), None if the
+        affected versions are unknown.
+        """
+        versions = [version.strip() for version in self.affected.split(',')
+                    if version.strip()]
+        if not versions:
+            return None
+        return versions[0], versions[-1]
+
+    def affects(self, version):
+        """Return True if the version is affected by the vulnerability."""
+        versions = self.affected_versions()
+        if not versions:
+            return False
+        return (get_version_tuple(versions[0]) <=
+                get_version_tuple(version) <=
+                get_version_tuple(versions[1]))
 
     def description_i18n(self):
         """Return the translated description."""
@@ -222,4 +271,17 @@ def handler_security_saved(sender, **kwargs):
     i18n_autogen('doc', 'security', strings)
 
 
+def handler_security_presave(sender, **kwargs):
+    """Build HTML with links before a security is saved."""
+    kwargs['instance'].refresh_links()
+
+
+def handler_security_changed(sender, **kwargs):
+    """Change version of security issues after update/delete of one."""
+    touch_version_on_commit('security')
+
+
+pre_save.connect(handler_security_presave, sender=Security)
 post_save.connect(handler_security_saved, sender=Security)
+post_save.connect(handler_security_changed, sender=Security)
+post_delete.connect(handler_security_changed, sender=Security)
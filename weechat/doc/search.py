@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Full-text search in documentation.
+
+The HTML docs (files "weechat_*.html" in directory "doc" of FILES_ROOT
+and its sub-directories, except "old") are split in sections (one per
+heading with an anchor) and indexed in a SQLite database with module
+FTS5 (file "cache/doc/search.sqlite" of FILES_ROOT).
+
+The index is updated by command "./manage.py build_doc_index": only the
+files changed since the last update are indexed again.
+"""
+
+from io import open
+import json
+import logging
+import os
+import re
+import sqlite3
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from weechat.common.path import files_path_join, get_file_key
+from weechat.doc.manifest import get_doc_manifest, is_doc_file
+
+try:
+    from html.parser import HTMLParser
+except ImportError:
+    # python 2.x
+    from HTMLParser import HTMLParser
+
+# version of index (to change if the parser or the tables change)
+SEARCH_INDEX_VERSION = 1
+
+# HTML elements with a title of section
+HEADINGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# HTML elements without end tag
+VOID_ELEMENTS = ('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                 'link', 'meta', 'param', 'source', 'track', 'wbr')
+
+# markers of matching words in snippets (replaced by HTML tags)
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+SEARCH_TABLES = (
+    'CREATE TABLE docs (path TEXT PRIMARY KEY, version TEXT, lang TEXT, '
+    'title TEXT, key TEXT)',
+    'CREATE VIRTUAL TABLE sections USING fts5(title, content, '
+    'path UNINDEXED, anchor UNINDEXED, version UNINDEXED, lang UNINDEXED, '
+    'tokenize = "unicode61 remove_diacritics 1")',
+)
+
+
+class DocParser(HTMLParser):  # pylint: disable=abstract-method
+    """
+    Split a HTML doc in sections: list of [anchor, title, text], the first
+    section (before first heading) has the title of document.
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.title = ''
+        self.sections = [['', [], []]]
+        self.in_title = False
+        self.in_heading = False
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            self.add_text(' ')
+            return
+        if self.skip:
+            self.skip += 1
+            return
+        attrs = dict(attrs)
+        if tag in ('script', 'style') or \
+                (tag == 'div' and attrs.get('id') == 'toc'):
+            self.skip = 1
+        elif tag == 'title':
+            self.in_title = True
+        elif tag in HEADINGS:
+            self.in_heading = True
+            self.sections.append([attrs.get('id') or '', [], []])
+        elif self.in_heading and attrs.get('id') and \
+                not self.sections[-1][0]:
+            self.sections[-1][0] = attrs['id']
+        self.add_text(' ')
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        if self.skip:
+            self.skip -= 1
+            return
+        if tag == 'title':
+            self.in_title = False
+        elif tag in HEADINGS:
+            self.in_heading = False
+        self.add_text(' ')
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        else:
+            self.add_text(data)
+
+    def add_text(self, text):
+        """Add text to the title or content of current section."""
+        if not self.skip:
+            self.sections[-1][1 if self.in_heading else 2].append(text)
+
+    def get_sections(self):
+        """Return sections: list of tuples (anchor, title, text)."""
+        sections = []
+        for anchor, title, text in self.sections:
+            title = ' '.join(''.join(title).split())
+            text = ' '.join(''.join(text).split())
+            if title or text:
+                sections.append((anchor, title or self.title.strip(), text))
+        return sections
+
+
+def parse_doc(filename):
+    """Return title and sections (see DocParser) of a HTML doc."""
+    parser = DocParser()
+    with open(filename, 'r', encoding='utf-8', errors='replace') as _file:
+        parser.feed(_file.read())
+    parser.close()
+    return ' '.join(parser.title.split()), parser.get_sections()
+
+
+def get_search_index_filename():
+    """Return the name of the search index."""
+    return files_path_join('cache', 'doc', 'search.sqlite')
+
+
+def open_search_index():
+    """Open the search index (create tables if needed) and return it."""
+    filename = get_search_index_filename()
+    directory = os.path.dirname(filename)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    conn = sqlite3.connect(filename)
+    if conn.execute('PRAGMA user_version').fetchone()[0] != \
+            SEARCH_INDEX_VERSION:
+        with conn:
+            conn.execute('DROP TABLE IF EXISTS docs')
+            conn.execute('DROP TABLE IF EXISTS sections')
+            for sql in SEARCH_TABLES:
+                conn.execute(sql)
+            conn.execute('PRAGMA user_version = %d' % SEARCH_INDEX_VERSION)
+    return conn
+
+
+def get_indexable_docs():
+    """
+    Return docs to index: {path: (version, lang)}, where path is relative
+    to directory "doc" and version is the directory ('' for "doc").
+    """
+    docs = {}
+    for directory, content in get_doc_manifest()['directories'].items():
+        if directory == 'old':
+            continue
+        for filename in content['files']:
+            if not is_doc_file(filename):
+                continue
+            lang = filename[8:-5].rpartition('.')[2]
+            if lang:
+                docs[os.path.join(directory, filename)] = (directory, lang)
+    return docs
+
+
+def update_search_index(full=False):
+    """
+    Update the search index with docs added, changed or removed since the
+    last update (all docs if full is True).
+
+    Return a tuple (indexed, removed, unchanged): numbers of docs.
+    """
+    docs = get_indexable_docs()
+    indexed = 0
+    unchanged = 0
+    conn = open_search_index()
+    try:
+        with conn:
+            if full:
+                conn.execute('DELETE FROM docs')
+                conn.execute('DELETE FROM sections')
+            keys = dict(conn.execute('SELECT path, key FROM docs'))
+            removed = [path for path in keys if path not in docs]
+            for path in removed:
+                conn.execute('DELETE FROM docs WHERE path = ?', (path,))
+                conn.execute('DELETE FROM sections WHERE path = ?', (path,))
+            for path, (version, lang) in sorted(docs.items()):
+                filename = files_path_join('doc', path)
+                key = json.dumps(get_file_key(filename))
+                if keys.get(path) == key:
+                    unchanged += 1
+                    continue
+                title, sections = parse_doc(filename)
+                conn.execute('DELETE FROM sections WHERE path = ?', (path,))
+                conn.executemany(
+                    'INSERT INTO sections (title, content, path, anchor, '
+                    'version, lang) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(section_title, text, path, anchor, version, lang)
+                     for anchor, section_title, text in sections])
+                conn.execute(
+                    'INSERT OR REPLACE INTO docs (path, version, lang, title, '
+                    'key) VALUES (?, ?, ?, ?, ?)',
+                    (path, version, lang, title, key))
+                indexed += 1
+    finally:
+        conn.close()
+    return indexed, len(removed), unchanged
+
+
+def get_match_query(query):
+    """
+    Return the FTS5 query for words of a query (all words are required,
+    the last one can be a prefix), None if there is no word.
+    """
+    words = re.findall(r'\w+', query, re.UNICODE)
+    if not words:
+        return None
+    return '%s*' % ' '.join('"%s"' % word for word in words)
+
+
+def search_docs(query, version, lang, limit=50):
+    """
+    Search docs of a version (directory "stable", "devel", ...) and in a
+    language and return the best sections: a list of dicts with keys url,
+    doc (title of doc), title (title of section) and snippet (HTML).
+
+    Return None if the search index is not available.
+    """
+    match = get_match_query(query)
+    filename = get_search_index_filename()
+    if get_file_key(filename) is None:
+        return None
+    if not match:
+        return []
+    try:
+        conn = sqlite3.connect(filename)
+        try:
+            rows = conn.execute(
+                'SELECT sections.path, anchor, sections.title, docs.title, '
+                'snippet(sections, 1, ?, ?, ?, 24) '
+                'FROM sections JOIN docs ON docs.path = sections.path '
+                'WHERE sections MATCH ? AND sections.version IN (?, \'\') '
+                'AND sections.lang = ? '
+                'ORDER BY bm25(sections, 5.0, 1.0) LIMIT ?',
+                (SNIPPET_START, SNIPPET_END, u'\u2026', match, version, lang,
+                 limit)).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        logging.getLogger(__name__).exception('unable to search in docs')
+        return None
+    return [
+        {
+            'url': '/files/doc/%s%s' % (
+                path.replace(os.sep, '/'), '#%s' % anchor if anchor else ''),
+            'doc': doc_title,
+            'title': title,
+            'snippet': mark_safe(escape(snippet)
+                                 .replace(SNIPPET_START, '<mark>')
+                                 .replace(SNIPPET_END, '</mark>')),
+        }
+        for path, anchor, title, doc_title, snippet in rows
+    ]
@@ -27,13 +27,21 @@ from django.conf.urls import url
 from weechat.doc.views import (
     documentation as view_doc,
     documentation_link as view_doc_link,
+    search as view_search,
     security as view_security,
+    security_advisories as view_security_advisories,
 )
 
 urlpatterns = [
     url(r'^$', view_doc, name='doc'),
     url(r'^(?P<version>stable|devel|old)/$', view_doc, name='doc_version'),
     url(r'^security/$', view_security, name='doc_security'),
+    url(r'^security/advisories\.(?P<content_format>json|csv)$',
+        view_security_advisories, name='doc_security_advisories'),
+    url(r'^security/(?P<version>[0-9][0-9a-z.-]*)/'
+        r'advisories\.(?P<content_format>json|csv)$',
+        view_security_advisories, name='doc_security_advisories_version'),
+    url(r'^search/$', view_search, name='doc_search'),
 
     # shortcuts
     url(r'^(?P<version>stable|devel)/(?P<name>[a-z_]+)/$', view_doc_link),
@@ -21,18 +21,36 @@
 """Views for "doc" menu."""
 
 from datetime import datetime
+import json
+import logging
 from math import ceil
 import os
 import pytz
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
 from django.shortcuts import render, redirect
-from django.utils.translation import ugettext
+from django.utils.translation import get_language, ugettext
 
-from weechat.common.path import files_path_join
-from weechat.doc.models import Language, Version, Doc, Security
-from weechat.download.models import Release
+from weechat.common.cache import get_cache_key, get_cached, get_version
+from weechat.common.decorators import conditional_view
+from weechat.common.path import files_path_join, get_file_key
+from weechat.doc.manifest import (
+    get_doc_file_date,
+    get_doc_files,
+    get_doc_url,
+    get_doc_manifest,
+)
+from weechat.doc.models import (
+    Language,
+    Version,
+    Doc,
+    Security,
+    SECURITY_SEVERITIES,
+)
+from weechat.doc.search import search_docs
+from weechat.download.models import get_release
 
 I18N_MAINTAINER = {
     'cs': ('-', ''),
@@ -58,54 +76,94 @@ DOC_SHORTCUT_ALIAS = {
 }
 
 
+# i18n stats: [key of file, stats, {language: stats with translated labels}]
+I18N_STATS = [None, None, {}]
+
+
+def parse_i18n_stats(filename):
+    """
+    Parse the file with i18n stats and return a dictionary (see
+    get_i18n_stats()), without the translated languages.
+
+    Raise IOError if the file can not be read and ValueError if a line
+    is invalid.
+    """
+    timezone = pytz.timezone(settings.TIME_ZONE)
+    date = datetime.fromtimestamp(os.path.getmtime(filename), tz=timezone)
+    langs = []
+    with open(filename, 'r') as _file:
+        for lineno, line in enumerate(_file, 1):
+            items = line.split(':')
+            if len(items) != 2:
+                continue
+            lang = items[0]
+            try:
+                translated, fuzzy, untranslated = [
+                    float(count) for count in items[1].split(',')[:3]]
+            except ValueError:
+                raise ValueError('%s:%d: invalid counts: "%s"' % (
+                    filename, lineno, line.strip()))
+            total = translated + fuzzy + untranslated
+            if total != 0:
+                pct_fuzzy = int(ceil((fuzzy * 100) / total))
+                pct_untranslated = int(ceil((untranslated * 100) / total))
+                pct_translated = 100 - pct_fuzzy - pct_untranslated
+                if pct_translated < 0:
+                    pct_translated = 0
+                nick, name = I18N_MAINTAINER.get(lang, ('-', ''))
+                langs.append({
+                    'lang': lang,
+                    'nick': nick,
+                    'name': name,
+                    'translated': int(translated),
+                    'pct_translated': pct_translated,
+                    'fuzzy': int(fuzzy),
+                    'pct_fuzzy': pct_fuzzy,
+                    'untranslated': int(untranslated),
+                    'pct_untranslated': pct_untranslated,
+                    'total': int(total),
+                })
+    return {'date': date, 'langs': langs}
+
+
 def get_i18n_stats():
     """Return i18n stats, as a dictionary.
 
     The returned dictionary has following keys:
     - date: date/time of last translations update
     - langs: a dictionary with info about status of this language.
+
+    The file is parsed again only when it changes; None is returned if the
+    file does not exist or is invalid (the error is logged).
     """
-    try:
-        timezone = pytz.timezone(settings.TIME_ZONE)
-        filename = files_path_join('stats', 'i18n.txt')
-        date = datetime.fromtimestamp(os.path.getmtime(filename), tz=timezone)
-        with open(filename, 'r') as _file:
-            langs = []
-            for line in _file:
-                items = line.split(':')
-                if len(items) == 2:
-                    lang = items[0]
-                    count = items[1].split(',')
-                    translated = float(count[0])
-                    fuzzy = float(count[1])
-                    untranslated = float(count[2])
-                    total = translated + fuzzy + untranslated
-                    if total != 0:
-                        pct_fuzzy = int(ceil((fuzzy * 100) / total))
-                        pct_untranslated = int(
-                            ceil((untranslated * 100) / total))
-                        pct_translated = 100 - pct_fuzzy - pct_untranslated
-                        if pct_translated < 0:
-                            pct_translated = 0
-                        nick, name = I18N_MAINTAINER.get(lang, ('-', ''))
-                        langs.append({
-                            'lang': lang,
-                            'lang_i18n': (ugettext(Language.LANG_I18N[lang])
-                                          if lang in Language.LANG_I18N
-                                          else lang),
-                            'nick': nick,
-                            'name': name,
-                            'translated': int(translated),
-                            'pct_translated': pct_translated,
-                            'fuzzy': int(fuzzy),
-                            'pct_fuzzy': pct_fuzzy,
-                            'untranslated': int(untranslated),
-                            'pct_untranslated': pct_untranslated,
-                            'total': int(total),
-                        })
-        return {'date': date, 'langs': langs}
-    except:  # noqa: E722
+    filename = files_path_join('stats', 'i18n.txt')
+    key = get_file_key(filename)
+    if key != I18N_STATS[0]:
+        stats = None
+        if key is not None:
+            try:
+                stats = parse_i18n_stats(filename)
+            except (IOError, OSError, ValueError):
+                logging.getLogger(__name__).exception(
+                    'unable to read i18n stats')
+        I18N_STATS[:] = [key, stats, {}]
+    if I18N_STATS[1] is None:
         return None
+    language = get_language()
+    stats = I18N_STATS[2].get(language)
+    if stats is None:
+        stats = {
+            'date': I18N_STATS[1]['date'],
+            'langs': [
+                dict(lang,
+                     lang_i18n=(ugettext(Language.LANG_I18N[lang['lang']])
+                                if lang['lang'] in Language.LANG_I18N
+                                else lang['lang']))
+                for lang in I18N_STATS[1]['langs']
+            ],
+        }
+        I18N_STATS[2][language] = stats
+    return stats
 
 
 def get_bestlang(request, languages):
@@ -126,13 +184,11 @@ def get_bestlang(request, languages):
 def documentation(request, version='stable'):
     """Page with docs for stable or devel version."""
     timezone = pytz.timezone(settings.TIME_ZONE)
+    manifest = get_doc_manifest()
     if version == 'old':
-        doc_list = None
-        try:
-            doc_list = sorted(os.listdir(files_path_join('doc', 'old')),
-                              reverse=True)
-        except:  # noqa: E722
-            pass
+        doc_list = get_doc_files('old', manifest)
+        if doc_list is not None:
+            doc_list = sorted(doc_list, reverse=True)
         return render(
             request,
             'doc/doc_version.html',
@@ -141,31 +197,30 @@ def documentation(request, version='stable'):
                 'doc_list': doc_list,
             },
         )
-    languages = Language.objects.all().order_by('priority')
+    languages = list(Language.objects.all().order_by('priority'))
     bestlang = get_bestlang(request, languages)
     versions = Version.objects.all().order_by('priority')
-    docs = Doc.objects.all().order_by('version__priority', 'priority')
+    docs = (Doc.objects.all().select_related('version')
+            .order_by('version__priority', 'priority'))
     doc_list = []
     doc_list2 = []
     for doc in docs:
         if doc.version.version != '-':
-            docv = Release.objects.get(
-                version=doc.version.version).description
+            docv = get_release(doc.version.version).description
         else:
             docv = doc.version.version
         stable_devel = 'devel' if docv.find('-') > 0 else 'stable'
         if stable_devel == version or docv == '-':
             files = []
             for lang in languages:
-                name = '%s/weechat_%s.%s.html' % (
-                    doc.version.directory, doc.name, lang.lang)
-                full_name = files_path_join('doc', name)
-                if os.path.exists(full_name):
+                name = os.path.normpath('%s/weechat_%s.%s.html' % (
+                    doc.version.directory, doc.name, lang.lang))
+                date = get_doc_file_date(name, manifest)
+                if date is not None:
                     files.append(
                         (
-                            os.path.normpath(name),
-                            datetime.fromtimestamp(os.path.getmtime(full_name),
-                                                   tz=timezone),
+                            name,
+                            datetime.fromtimestamp(date, tz=timezone),
                             lang,
                         )
                     )
@@ -176,7 +231,7 @@ def documentation(request, version='stable'):
             else:
                 doc_list2.append([doc, files])
     try:
-        doc_version = Release.objects.get(version=version).description
+        doc_version = get_release(version).description
     except ObjectDoesNotExist:
         doc_version = None
     return render(
@@ -196,7 +251,8 @@ def documentation(request, version='stable'):
 
 def documentation_link(request, version='stable', name=None, lang='en'):
     """
-    Shortcuts to docs, with English and stable version as default.
+    Shortcuts to docs, with English and stable version as default (and
+    English if the doc is not available in the language).
 
     For example:
       /doc/api          => /files/doc/stable/weechat_plugin_api.en.html
@@ -205,14 +261,36 @@ def documentation_link(request, version='stable', name=None, lang='en'):
       /doc/user         => /files/doc/stable/weechat_user.en.html
     """
     if version and name and lang:
-        doc_name = DOC_SHORTCUT_ALIAS.get(name, name)
-        filename = 'weechat_%s.%s.html' % (doc_name, lang)
-        full_name = files_path_join('doc', version, filename)
-        if os.path.exists(full_name):
-            return redirect('/files/doc/%s/%s' % (version, filename))
+        url = get_doc_url(version, DOC_SHORTCUT_ALIAS.get(name, name), lang)
+        if url:
+            return redirect(url)
     return redirect('doc')
 
 
+def search(request):
+    """Page with search in docs."""
+    languages = list(Language.objects.all().order_by('priority'))
+    query = request.GET.get('q', '').strip()
+    version = request.GET.get('version', 'stable')
+    if version not in ('stable', 'devel'):
+        version = 'stable'
+    lang = request.GET.get('lang', '')
+    if lang not in [language.lang for language in languages]:
+        lang = get_bestlang(request, languages) or 'en'
+    results = search_docs(query, version, lang) if query else []
+    return render(
+        request,
+        'doc/search.html',
+        {
+            'query': query,
+            'version': version,
+            'lang': lang,
+            'languages': languages,
+            'results': results,
+        },
+    )
+
+
 def security(request):
     """Page with security vulnerabilities."""
     security_list = Security.objects.all().filter(visible=1).order_by('-date')
@@ -223,3 +301,86 @@ def security(request):
             'security_list': security_list,
         },
     )
+
+
+SECURITY_ADVISORY_FIELDS = ('id', 'date', 'external', 'tracker', 'severity',
+                            'severity_name', 'affected_first',
+                            'affected_last', 'fixed', 'release_date',
+                            'commits', 'description', 'workaround')
+
+
+def get_security_advisories(version=None):
+    """
+    Return visible security vulnerabilities as a list of dicts (keys:
+    SECURITY_ADVISORY_FIELDS), only those affecting the version if given.
+    """
+    severities = dict(SECURITY_SEVERITIES)
+    advisories = []
+    for security in Security.objects.filter(visible=1).order_by('-date'):
+        if version and not security.affects(version):
+            continue
+        affected = security.affected_versions() or ('', '')
+        advisories.append({
+            'id': security.pk,
+            'date': security.date.isoformat(),
+            'external': security.external,
+            'tracker': security.tracker,
+            'severity': security.severity,
+            'severity_name': severities.get(security.severity, ''),
+            'affected_first': affected[0],
+            'affected_last': affected[1],
+            'fixed': security.fixed,
+            'release_date': (security.release_date.isoformat()
+                             if security.release_date else ''),
+            'commits': security.commits,
+            'description': security.description.replace('\r\n', '\n'),
+            'workaround': security.workaround.replace('\r\n', '\n'),
+        })
+    return advisories
+
+
+def get_csv_line(values):
+    """
+    Return a CSV line with values, quoted if needed (same format as module
+    csv, which does not support unicode with python 2.x).
+    """
+    fields = []
+    for value in values:
+        value = '%s' % value
+        if any(char in value for char in ',"\r\n'):
+            value = '"%s"' % value.replace('"', '""')
+        fields.append(value)
+    return '%s\r\n' % ','.join(fields)
+
+
+def build_security_advisories(content_format, version=None):
+    """Return security vulnerabilities as JSON or CSV (string)."""
+    advisories = get_security_advisories(version)
+    if content_format == 'json':
+        return json.dumps(advisories, indent=2, sort_keys=True)
+    lines = [get_csv_line(SECURITY_ADVISORY_FIELDS)]
+    for advisory in advisories:
+        lines.append(get_csv_line([advisory[field]
+                                   for field in SECURITY_ADVISORY_FIELDS]))
+    return ''.join(lines)
+
+
+@conditional_view(['security'])
+def security_advisories(request, content_format, version=None):
+    """
+    Security vulnerabilities as JSON or CSV (all or only those affecting
+    a version), for packagers and tools.
+    """
+    content = get_cached(
+        get_cache_key('security_advisories', content_format, version),
+        get_version('security'),
+        lambda: build_security_advisories(content_format, version))
+    content_type = {
+        'json': 'application/json',
+        'csv': 'text/csv; charset=utf-8',
+    }[content_format]
+    response = HttpResponse(content, content_type=content_type)
+    response['Content-disposition'] = (
+        'inline; filename=weechat-security%s.%s' % (
+            '-%s' % version if version else '', content_format))
+    return response
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Refresh metadata of package files."""
+
+from django.core.management.base import BaseCommand
+
+from weechat.common.cache import touch_version
+from weechat.download.models import Package
+
+METADATA_FIELDS = ('file_exists', 'file_size', 'file_mtime', 'gpg_sig')
+
+
+class Command(BaseCommand):
+    """Refresh metadata of package files."""
+    help = ('Refresh metadata of package files (existence, size, date and '
+            'GPG signature), to run after files are added or replaced.')
+
+    def handle(self, *args, **options):
+        count = 0
+        for package in Package.objects.select_related('type'):
+            old = [getattr(package, field) for field in METADATA_FIELDS]
+            package.refresh_metadata()
+            new = [getattr(package, field) for field in METADATA_FIELDS]
+            if new != old:
+                # update only metadata (checksums are not computed again)
+                Package.objects.filter(pk=package.pk).update(
+                    **dict(zip(METADATA_FIELDS, new)))
+                count += 1
+        if count:
+            # update() sends no signal: change version of packages so that
+            # pages with packages are not answered "304 Not Modified"
+            touch_version('packages')
+        self.stdout.write('%d packages updated' % count)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Verify checksums and GPG signatures of package files."""
+
+import json
+from multiprocessing import cpu_count, Pool
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from weechat.common.cache import touch_version
+from weechat.common.checksum import get_file_checksums
+from weechat.download.models import CHECKSUM_TYPES, Package
+
+
+def check_file(filename):
+    """
+    Return a tuple (checksums, gpg_sig) for a file: checksums is a dict
+    {type: checksum} (None if the file can not be read) and gpg_sig is
+    True if the file has a GPG signature.
+    """
+    try:
+        checksums = get_file_checksums(filename, CHECKSUM_TYPES)
+    except (IOError, OSError):
+        checksums = None
+    return checksums, os.path.isfile(filename + '.asc')
+
+
+class Command(BaseCommand):
+    """Verify checksums and GPG signatures of package files."""
+    help = ('Verify checksums and GPG signatures of package files (all '
+            'versions except devel, or the given versions).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('versions', nargs='*', metavar='version',
+                            help='version to verify')
+        parser.add_argument('-j', '--jobs', type=int, default=cpu_count(),
+                            help='number of processes (default: number '
+                            'of CPUs)')
+        parser.add_argument('--json', action='store_true',
+                            help='display result as JSON')
+        parser.add_argument('--fix', action='store_true',
+                            help='store checksums of files which differ '
+                            'from checksums in database')
+
+    def handle(self, *args, **options):
+        packages = (Package.objects.exclude(version='devel')
+                    .exclude(filename='')
+                    .select_related('type')
+                    .order_by('-version__date', 'type__priority'))
+        if options['versions']:
+            packages = packages.filter(version__in=options['versions'])
+        packages = list(packages)
+        # database connections must not be shared with the processes
+        connections.close_all()
+        pool = Pool(max(1, options['jobs']))
+        try:
+            results = pool.map(check_file,
+                               [package.fullname() for package in packages],
+                               chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        report = []
+        problems = 0
+        for package, (checksums, gpg_sig) in zip(packages, results):
+            errors = []
+            if checksums is None:
+                errors.append('missing file')
+            else:
+                for checksum_type in CHECKSUM_TYPES:
+                    stored = package.checksum(checksum_type)
+                    if not stored:
+                        errors.append('no %s' % checksum_type)
+                    elif stored != checksums[checksum_type]:
+                        errors.append('bad %s' % checksum_type)
+            if checksums is not None and not gpg_sig:
+                errors.append('no GPG signature')
+            fixed = False
+            if options['fix'] and checksums is not None and \
+                    any(error.startswith(('no sha', 'bad sha'))
+                        for error in errors):
+                Package.objects.filter(pk=package.pk).update(**{
+                    '%ssum' % checksum_type: checksums[checksum_type]
+                    for checksum_type in CHECKSUM_TYPES
+                })
+                fixed = True
+            # errors other than checksums are not fixed
+            if any(not fixed or not error.startswith(('no sha', 'bad sha'))
+                   for error in errors):
+                problems += 1
+            report.append({
+                'version': package.version_id,
+                'filename': package.filename,
+                'status': ('fixed' if fixed
+                           else 'error' if errors
+                           else 'ok'),
+                'errors': errors,
+            })
+        if any(item['status'] == 'fixed' for item in report):
+            # update() sends no signal: change version of packages (shared
+            # by all processes) so that pages with checksums are not
+            # answered "304 Not Modified"
+            touch_version('packages')
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for item in report:
+                self.stdout.write(('%-6s %-12s %-40s %s' % (
+                    item['status'],
+                    item['version'],
+                    item['filename'],
+                    ', '.join(item['errors']))).rstrip())
+            self.stdout.write('%d packages verified, %d with errors' % (
+                len(report), problems))
+        if problems:
+            raise CommandError('%d packages with errors' % problems)
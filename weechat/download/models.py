@@ -21,14 +21,15 @@
 """Models for "download" menu."""
 
 from datetime import datetime
-from hashlib import sha1, sha512
 import os
 import pytz
 
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 
+from weechat.common.cache import get_version, touch_version_on_commit
+from weechat.common.checksum import get_file_checksums
 from weechat.common.path import files_path_join
 from weechat.common.templatetags.localdate import localdate
 
@@ -66,6 +67,35 @@ class Release(models.Model):
         ordering = ['-date']
 
 
+# snapshot of releases: [version of releases, {version: Release}]
+RELEASES = [None, {}]
+
+
+def get_releases():
+    """
+    Return all releases: {version: Release}, read again from database
+    only after a change of releases in any process (see touch_version()).
+    """
+    releases_version = get_version('releases')
+    if RELEASES[0] != releases_version:
+        RELEASES[:] = [
+            releases_version,
+            {release.version: release for release in Release.objects.all()},
+        ]
+    return RELEASES[1]
+
+
+def get_release(version):
+    """
+    Return a release ("stable", "devel" or a version number), raise
+    Release.DoesNotExist if not found.
+    """
+    release = get_releases().get(version)
+    if release is None:
+        raise Release.DoesNotExist('release "%s" not found' % version)
+    return release
+
+
 class Type(models.Model):
     """A type of package (source, debian, etc.)."""
     type = models.CharField(max_length=64, primary_key=True)
@@ -90,17 +120,27 @@ class Type(models.Model):
         ordering = ['priority']
 
 
+# types of checksums of packages (field "<type>sum" in Package)
+CHECKSUM_TYPES = ('sha1', 'sha256', 'sha512')
+
+
 class Package(models.Model):
     """A WeeChat package."""
     version = models.ForeignKey(Release, on_delete=models.CASCADE)
     type = models.ForeignKey(Type, on_delete=models.CASCADE)
     filename = models.CharField(max_length=512, blank=True)
     sha1sum = models.CharField(max_length=128, blank=True)
+    sha256sum = models.CharField(max_length=128, blank=True)
     sha512sum = models.CharField(max_length=128, blank=True)
     display_time = models.BooleanField(default=False)
     directory = models.CharField(max_length=256, blank=True)
     url = models.CharField(max_length=512, blank=True)
     text = models.CharField(max_length=512, blank=True)
+    # metadata of file on disk, see refresh_metadata()
+    file_exists = models.BooleanField(default=False, editable=False)
+    file_size = models.BigIntegerField(null=True, editable=False)
+    file_mtime = models.FloatField(null=True, editable=False)
+    gpg_sig = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         if self.filename != '':
@@ -130,66 +170,103 @@ class Package(models.Model):
 
     def has_checksum(self):
         """Checks if the package has a checksum."""
-        return any([self.sha512sum, self.sha1sum])
+        return any([self.sha512sum, self.sha256sum, self.sha1sum])
 
     def checksum_type(self):
         """Return the type of package checksum."""
         if self.sha512sum:
             return 'sha512'
+        if self.sha256sum:
+            return 'sha256'
         if self.sha1sum:
             return 'sha1'
         return ''
 
-    def checksum(self):
-        """Return the package checksum."""
-        if self.sha512sum:
-            return self.sha512sum
-        if self.sha1sum:
-            return self.sha1sum
+    def checksum(self, checksum_type=None):
+        """
+        Return the package checksum (of the given type, or the strongest
+        one available).
+        """
+        if checksum_type is None:
+            checksum_type = self.checksum_type()
+        if checksum_type in CHECKSUM_TYPES:
+            return getattr(self, '%ssum' % checksum_type)
         return ''
 
+    def refresh_metadata(self):
+        """
+        Read metadata of package file on disk: existence, size, date and
+        GPG signature (the package is not saved).
+        """
+        try:
+            fstat = os.stat(self.fullname())
+            self.file_exists = True
+            self.file_size = fstat.st_size
+            self.file_mtime = fstat.st_mtime
+        except OSError:
+            self.file_exists = False
+            self.file_size = None
+            self.file_mtime = None
+        self.gpg_sig = os.path.isfile(self.fullname_gpg_sig())
+
     def has_gpg_sig(self):
         """Checks if the package has a GPG signature."""
-        return os.path.isfile(self.fullname_gpg_sig())
+        return self.gpg_sig
 
     def exists(self):
         """Checks if the package exists (on disk)."""
-        return os.path.exists(self.fullname())
+        return self.file_exists
 
     def filesize(self):
         """Return the size of package, in bytes (as string)."""
-        try:
-            return str(os.path.getsize(self.fullname()))
-        except:  # noqa: E722
+        if self.file_size is None:
             return ''
+        return str(self.file_size)
 
     def filedate(self):
         """Return the package date/time."""
-        try:
-            timezone = pytz.timezone(settings.TIME_ZONE)
-            return datetime.fromtimestamp(os.path.getmtime(self.fullname()),
-                                          tz=timezone)
-        except:  # noqa: E722
+        if self.file_mtime is None:
             return ''
+        timezone = pytz.timezone(settings.TIME_ZONE)
+        return datetime.fromtimestamp(self.file_mtime, tz=timezone)
 
     class Meta:
         ordering = ['version', '-type__priority']
 
 
 def handler_package_saved(sender, **kwargs):
-    """Compute SHA-1 and SHA-512 of file."""
+    """Read metadata of file and compute its checksums."""
+    package = kwargs['instance']
+    package.refresh_metadata()
     try:
-        package = kwargs['instance']
         if package.filename and package.version.version != 'devel':
-            with open(package.fullname(), 'rb') as _file:
-                package.sha1sum = sha1(_file.read()).hexdigest()
-            with open(package.fullname(), 'rb') as _file:
-                package.sha512sum = sha512(_file.read()).hexdigest()
+            checksums = get_file_checksums(package.fullname(),
+                                           CHECKSUM_TYPES)
+            for checksum_type in CHECKSUM_TYPES:
+                setattr(package, '%ssum' % checksum_type,
+                        checksums[checksum_type])
     except:  # noqa: E722
         pass
 
 
+def handler_release_changed(sender, **kwargs):
+    """Change version of releases after update/delete of a release."""
+    touch_version_on_commit('releases')
+    touch_version_on_commit('release_progress')
+
+
+def handler_package_changed(sender, **kwargs):
+    """Change version of packages after update/delete of a package/type."""
+    touch_version_on_commit('packages')
+
+
 pre_save.connect(handler_package_saved, sender=Package)
+post_save.connect(handler_release_changed, sender=Release)
+post_delete.connect(handler_release_changed, sender=Release)
+post_save.connect(handler_package_changed, sender=Package)
+post_delete.connect(handler_package_changed, sender=Package)
+post_save.connect(handler_package_changed, sender=Type)
+post_delete.connect(handler_package_changed, sender=Type)
 
 
 class ReleaseTodo(models.Model):
@@ -221,3 +298,14 @@ class ReleaseProgress(models.Model):
 
     class Meta:
         verbose_name_plural = 'release progress'
+
+
+def handler_release_progress_changed(sender, **kwargs):
+    """Change version of release progress after update/delete of an item."""
+    touch_version_on_commit('release_progress')
+
+
+post_save.connect(handler_release_progress_changed, sender=ReleaseTodo)
+post_delete.connect(handler_release_progress_changed, sender=ReleaseTodo)
+post_save.connect(handler_release_progress_changed, sender=ReleaseProgress)
+post_delete.connect(handler_release_progress_changed, sender=ReleaseProgress)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2003-2019 Sébastien Helleu <flashcode@flashtux.org>
+#
+# This file is part of WeeChat.org.
+#
+# WeeChat.org is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# WeeChat.org is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WeeChat.org.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Tests for "download" menu."""
+
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from weechat.download.models import RELEASES, Package, Release, Type
+
+
+class PackagesQueriesTestCase(TestCase):
+    """Number of queries in pages with packages."""
+
+    # queries for page /download/all/ (with an empty cache): releases,
+    # "to do" items, release progress and packages (with their release
+    # and type); it must not depend on the number of releases
+    QUERIES_ALL = 4
+
+    def setUp(self):
+        Release.objects.create(version='stable', description='1.0')
+        Release.objects.create(version='devel', description='2.0-dev')
+        self.types = [
+            Type.objects.create(type='src-%s' % ext, priority=i,
+                                description='Source (%s)' % ext)
+            for i, ext in enumerate(('gz', 'bz2', 'xz'))
+        ]
+        self.releases = 0
+
+    def add_releases(self, count):
+        """Add releases, each one with a package for each type."""
+        for _ in range(count):
+            self.releases += 1
+            release = Release.objects.create(
+                version='1.%d' % self.releases,
+                date=date(2000 + self.releases, 1, 1))
+            for package_type in self.types:
+                Package.objects.create(
+                    version=release, type=package_type,
+                    filename='weechat-%s.tar.%s' % (
+                        release.version, package_type.type[4:]))
+
+    def assert_queries_all(self):
+        """Check number of queries in page /download/all/."""
+        # versions are changed only on commit, which never happens in
+        # a test case: the snapshot of releases is emptied here
+        cache.clear()
+        RELEASES[:] = [None, {}]
+        with self.assertNumQueries(self.QUERIES_ALL):
+            response = self.client.get('/download/all/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['package_list']),
+                         self.releases * len(self.types))
+
+    def test_all_packages(self):
+        """Page /download/all/ with N, then 2N releases."""
+        self.add_releases(5)
+        self.assert_queries_all()
+        self.add_releases(5)
+        self.assert_queries_all()
@@ -23,34 +23,36 @@
 import re
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404
 from django.shortcuts import render
 
-from weechat.download.models import Release, Package
+from weechat.common.cache import get_cache_key, get_cached, get_version
+from weechat.common.decorators import conditional_view
+from weechat.download.models import CHECKSUM_TYPES, Package, get_release
 from weechat.download.models import ReleaseTodo, ReleaseProgress
 
 
-def get_release_progress():
+def compute_release_progress():
     """
-    Return release progress info as a tuple (version, date, todo, done, pct).
+    Compute release progress info (see get_release_progress()): the
+    progress is read with its release, and the "to do" items once.
     """
-    rel_todo = ReleaseTodo.objects.all().order_by('priority')
-    next_rel = Release.objects.get(version='devel')
+    rel_todo = list(ReleaseTodo.objects.all().order_by('priority'))
+    next_rel = get_release('devel')
     next_rel_version = re.sub('-.*', '', next_rel.description)
     next_rel_date = next_rel.date
-    rel_progress = ReleaseProgress.objects.all()
+    rel_progress = ReleaseProgress.objects.select_related('version').first()
     done = -1
     pct = 0
-    if len(rel_todo) > 0 and len(rel_progress) > 0 \
-            and rel_progress[0].done >= 0:
-        done = rel_progress[0].done
+    if rel_todo and rel_progress and rel_progress.done >= 0:
+        done = rel_progress.done
         pct = int((float(done) / len(rel_todo)) * 100)
         if pct < 0:
             pct = 0
         if pct > 100:
             pct = 100
-        next_rel_version = rel_progress[0].version.version
-        next_rel_date = rel_progress[0].version.date
+        next_rel_version = rel_progress.version.version
+        next_rel_date = rel_progress.version.date
     return {
         'version': next_rel_version,
         'date': next_rel_date,
@@ -60,28 +62,41 @@ def get_release_progress():
     }
 
 
+def get_release_progress():
+    """
+    Return release progress info as a dict (version, date, todo, done, pct),
+    cached until a change of releases, "to do" items or progress (in any
+    process: the version of release progress is shared).
+    """
+    return get_cached(get_cache_key('release_progress'),
+                      get_version('release_progress'),
+                      compute_release_progress)
+
+
 def packages(request, version='stable'):
     """Page with packages for a version (stable, devel, all, old, or x.y.z)."""
     package_list = None
     release_progress = None
+    # releases and types are read with packages (displayed for each package)
+    all_packages = Package.objects.select_related('version', 'type')
     try:
         if version == 'stable':
-            stable_desc = Release.objects.get(version='stable').description
-            package_list = (Package.objects.all().filter(version=stable_desc)
+            stable_desc = get_release('stable').description
+            package_list = (all_packages.filter(version=stable_desc)
                             .order_by('type__priority'))
         elif version == 'devel':
-            package_list = (Package.objects.all().filter(version='devel')
+            package_list = (all_packages.filter(version='devel')
                             .order_by('type__priority'))
         elif version == 'all':
-            package_list = (Package.objects.all().exclude(version='devel')
+            package_list = (all_packages.exclude(version='devel')
                             .order_by('-version__date', 'type__priority'))
         elif version == 'old':
-            stable_desc = Release.objects.get(version='stable').description
-            package_list = (Package.objects.all().exclude(version='devel')
+            stable_desc = get_release('stable').description
+            package_list = (all_packages.exclude(version='devel')
                             .exclude(version=stable_desc)
                             .order_by('-version__date', 'type__priority'))
         else:
-            package_list = (Package.objects.filter(version=version)
+            package_list = (all_packages.filter(version=version)
                             .order_by('type__priority'))
         release_progress = get_release_progress()
     except ObjectDoesNotExist:
@@ -98,13 +113,16 @@ def packages(request, version='stable'):
     )
 
 
+@conditional_view(['packages'])
 def package_checksums(request, version, checksum_type):
     """Page with checksums of packages in a version."""
+    if checksum_type not in CHECKSUM_TYPES:
+        raise Http404
     package_list = (Package.objects.filter(version=version)
                     .order_by('type__priority'))
     checksums = []
     for package in package_list:
-        checksum = package.checksum()
+        checksum = package.checksum(checksum_type)
         if checksum:
             checksums.append('%s  %s' % (checksum, package.filename))
     response = HttpResponse('\n'.join(checksums), content_type='text/plain')
@@ -23,13 +23,19 @@
 from datetime import datetime
 
 from django.contrib.syndication.views import Feed
+from django.utils.decorators import method_decorator
 
+from weechat.common.decorators import conditional_view
 from weechat.news.models import Info
 
 
 class WeechatFeed(Feed):
     """A WeeChat feed."""
 
+    @method_decorator(conditional_view(['news']))
+    def __call__(self, request, *args, **kwargs):
+        return super(WeechatFeed, self).__call__(request, *args, **kwargs)
+
     def get_object(self, request, *args, **kwargs):
         self.request = request
         return None
@@ -23,9 +23,10 @@
 import re
 
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import ugettext
 
+from weechat.common.cache import touch_version_on_commit
 from weechat.common.i18n import i18n_autogen
 from weechat.common.templatetags.localdate import localdate
 
@@ -89,4 +90,11 @@ def handler_info_saved(sender, **kwargs):
     i18n_autogen('news', 'info', strings)
 
 
+def handler_info_changed(sender, **kwargs):
+    """Change version of news after update/delete of an info."""
+    touch_version_on_commit('news')
+
+
 post_save.connect(handler_info_saved, sender=Info)
+post_save.connect(handler_info_changed, sender=Info)
+post_delete.connect(handler_info_changed, sender=Info)
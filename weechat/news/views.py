@@ -26,7 +26,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.shortcuts import render
 
-from weechat.download.models import Release
+from weechat.download.models import get_release
 from weechat.news.models import Info
 
 
@@ -42,8 +42,7 @@ def home(request, max_info=None, max_event=None):
     if max_event:
         event_list = event_list[:max_event]
     try:
-        stable_version = Release.objects.get(version='stable').description
-        release_stable = Release.objects.get(version=stable_version)
+        release_stable = get_release(get_release('stable').description)
     except ObjectDoesNotExist:
         release_stable = None
     return render(
@@ -20,9 +20,8 @@
 
 """Models for "scripts" menu."""
 
-import gzip
-from hashlib import md5
-from io import open
+from collections import OrderedDict
+import json
 import os
 import re
 from xml.sax.saxutils import escape
@@ -30,11 +29,14 @@ from xml.sax.saxutils import escape
 from django import forms
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
-from django.db.models.signals import post_save, post_delete
+from django.db import models, transaction
+from django.db.models import Max, Min
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.utils import translation
 from django.utils.translation import ugettext, ugettext_lazy, pgettext_lazy
 
+from weechat.common.build import register_build, schedule_build
+from weechat.common.cache import touch_version, touch_version_on_commit
 from weechat.common.decorators import disable_for_loaddata
 from weechat.common.forms import (
     BootstrapBoundField,
@@ -49,8 +51,10 @@ from weechat.common.forms import (
     getjsonline,
 )
 from weechat.common.i18n import i18n_autogen
+from weechat.common.models import FileDigest
+from weechat.common.index import IndexWriter
 from weechat.common.path import files_path_join
-from weechat.download.models import Release
+from weechat.download.models import get_release, get_releases
 
 SCRIPT_LANGUAGE = {
     'python': ('py', 'python'),
@@ -63,6 +67,17 @@ SCRIPT_LANGUAGE = {
     'php': ('php', 'php'),
 }
 
+PYGMENTS_LEXER = {
+    'pl': 'perl',
+    'py': 'python',
+    'rb': 'ruby',
+    'lua': 'lua',
+    'tcl': 'tcl',
+    'scm': 'scheme',
+    'js': 'javascript',
+    'php': 'php',
+}
+
 MAX_LENGTH_NAME = 32
 MAX_LENGTH_VERSION = 32
 MAX_LENGTH_URL = 512
@@ -70,12 +85,16 @@ MAX_LENGTH_LANGUAGE = 32
 MAX_LENGTH_LICENSE = 32
 MAX_LENGTH_MD5SUM = 256
 MAX_LENGTH_TAGS = 512
+MAX_LENGTH_TAG = 128
 MAX_LENGTH_DESC = 1024
 MAX_LENGTH_COMMENT = 1024
 MAX_LENGTH_REQUIRE = 512
 MAX_LENGTH_AUTHOR = 256
 MAX_LENGTH_MAIL = 256
 
+# number of changes kept in the log of changes (table ScriptChange)
+SCRIPT_CHANGES_KEEP = 10000
+
 
 def get_language_from_extension(ext):
     return next((key for key, value in SCRIPT_LANGUAGE.items()
@@ -120,6 +139,10 @@ class Script(models.Model):
         """Return True if a script is legacy (for WeeChat <= 0.2.6)."""
         return self.max_weechat == '0.2.6'
 
+    def is_indexed(self):
+        """Return True if a script is in the scripts index (plugins.xml)."""
+        return bool(self.visible) and not self.is_legacy()
+
     def tagslist(self):
         """Return a list with script tags."""
         return self.tags.split(',')
@@ -159,12 +182,19 @@ class Script(models.Model):
         """Return script extension."""
         return SCRIPT_LANGUAGE[self.language][0]
 
+    def pygments_lexer(self):
+        """Return name of pygments lexer for the script."""
+        return PYGMENTS_LEXER[self.extension()]
+
     def language_display(self):
         """Return script language."""
         return SCRIPT_LANGUAGE[self.language][1]
 
     def desc_i18n(self):
         """Return translated description."""
+        translations = getattr(self, 'translations_lang', None)
+        if translations:
+            return translations[0].desc
         if not isinstance(self.desc_en, str):
             # python 2.x
             return ugettext(self.desc_en.encode('utf-8'))
@@ -205,18 +235,136 @@ class Script(models.Model):
 
     def md5(self):
         """Return MD5 checksum of script."""
-        try:
-            with open(self.filename(), 'rb') as _file:
-                filemd5 = md5()
-                filemd5.update(_file.read())
-                return filemd5.hexdigest()
-        except:  # noqa: E722
-            return ''
+        digest = FileDigest.get(self.filename())
+        return digest.md5 if digest else ''
+
+    def sha256(self):
+        """Return SHA-256 checksum of script."""
+        digest = FileDigest.get(self.filename())
+        return digest.sha256 if digest else ''
 
     class Meta:
         ordering = ['-added']
 
 
+class ScriptTranslation(models.Model):
+    """
+    Translated description of a script, precomputed for all languages
+    (except English).
+    """
+    script = models.ForeignKey(Script, related_name='translations',
+                               on_delete=models.CASCADE)
+    lang = models.CharField(max_length=8)
+    # translations may be longer than the English description
+    desc = models.TextField()
+
+    def __str__(self):
+        return '%s (%s): %s' % (self.script.name, self.lang, self.desc)
+
+    def __unicode__(self):  # python 2.x
+        return self.__str__()
+
+    class Meta:
+        unique_together = ('script', 'lang')
+
+
+class ScriptTag(models.Model):
+    """A tag of a script (normalized copy of Script.tags)."""
+    script = models.ForeignKey(Script, related_name='tag_set',
+                               on_delete=models.CASCADE)
+    tag = models.CharField(max_length=MAX_LENGTH_TAG, db_index=True)
+
+    def __str__(self):
+        return '%s: %s' % (self.script.name, self.tag)
+
+    def __unicode__(self):  # python 2.x
+        return self.__str__()
+
+    class Meta:
+        unique_together = ('script', 'tag')
+
+
+def get_script_tags(scripts):
+    """Return list of ScriptTag objects for the scripts (not saved)."""
+    script_tags = []
+    for script in scripts:
+        tags = set(tag for tag in script.tagslist() if tag)
+        for tag in sorted(tags):
+            script_tags.append(ScriptTag(script=script, tag=tag))
+    return script_tags
+
+
+def build_scripts_tags():
+    """Build table of tags for all scripts."""
+    script_tags = get_script_tags(Script.objects.all())
+    with transaction.atomic():
+        ScriptTag.objects.all().delete()
+        ScriptTag.objects.bulk_create(script_tags)
+    touch_version('scripts')
+
+
+def get_translated_langs():
+    """Return list of languages with translated script descriptions."""
+    return [lang for lang in settings.LANGUAGES_LOCALES
+            if lang[0:2] != 'en']
+
+
+def translate_scripts(scripts):
+    """
+    Return list of ScriptTranslation objects for the scripts (not saved),
+    with a single activation of each language.
+    """
+    translations = []
+    for lang in get_translated_langs():
+        with translation.override(lang):
+            for script in scripts:
+                translations.append(
+                    ScriptTranslation(script=script, lang=lang,
+                                      desc=script.desc_i18n()))
+    return translations
+
+
+def get_scripts_translations(script_ids=None):
+    """
+    Return translated descriptions: {script_id: {lang: desc}}, for all
+    scripts or only the given script ids.
+    """
+    translations = {}
+    items = ScriptTranslation.objects.all()
+    if script_ids is not None:
+        items = items.filter(script_id__in=script_ids)
+    for script_id, lang, desc in items.values_list('script_id', 'lang',
+                                                   'desc'):
+        translations.setdefault(script_id, {})[lang] = desc
+    return translations
+
+
+def get_script_desc_i18n(script, translations):
+    """
+    Return translated descriptions of a script: {lang: desc}, translated
+    now if they are not yet built in table ScriptTranslation.
+    """
+    desc_i18n = translations.get(script.id)
+    if desc_i18n is None or len(desc_i18n) < len(get_translated_langs()):
+        desc_i18n = {
+            item.lang: item.desc
+            for item in translate_scripts([script])
+        }
+    return desc_i18n
+
+
+def build_scripts_i18n():
+    """
+    Build table of translated descriptions for all scripts (this must
+    be done after compilation of messages).
+    """
+    translations = translate_scripts(Script.objects.all())
+    with transaction.atomic():
+        ScriptTranslation.objects.all().delete()
+        ScriptTranslation.objects.bulk_create(translations)
+    schedule_build('scripts')
+
+
 class NameField(forms.CharField):
     """Name field in new script form."""
 
@@ -243,10 +391,11 @@ def get_min_max_choices():
     """Get min/max versions for add form."""
     version_min_max = []
     try:
-        devel_desc = Release.objects.get(version='devel').description
-        releases = Release.objects.filter(
-            version__gte='0.3.0',
-            version__lte=re.sub('-.*', '', devel_desc)).order_by('date')
+        devel_desc = get_release('devel').description
+        max_version = re.sub('-.*', '', devel_desc)
+        releases = [rel for rel in get_releases().values()
+                    if '0.3.0' <= rel.version <= max_version]
+        releases.sort(key=lambda rel: (rel.date is not None, rel.date))
         for rel in releases:
             version = (
                 '{}:-'.format(rel.version),
@@ -403,51 +552,108 @@ class ScriptFormUpdate(Form):
         self.fields['script'].choices = get_script_choices()
 
 
-@disable_for_loaddata
-def handler_script_changed(sender, **kwargs):
-    """Build files plugins.{xml,json}(.gz) after update/delete of a script."""
-    xml = '<?xml version="1.0" encoding="utf-8"?>\n'
-    xml += '<plugins>\n'
-    json = '[\n'
+# XML/JSON fragments of scripts in plugins.{xml,json}, by script id:
+# {id: (key, xml, json)}, see get_index_fragment()
+INDEX_FRAGMENTS = {}
+
+
+def get_index_fragment_key(script, desc_i18n):
+    """
+    Return the key used to check if the cached index fragment of a script
+    is still valid: all the fields of the script, the translated
+    descriptions and the size/date of the script file.
+    """
+    try:
+        fstat = os.stat(script.filename())
+        file_key = (fstat.st_size, fstat.st_mtime)
+    except OSError:
+        file_key = None
+    return (
+        tuple(getattr(script, field.attname)
+              for field in script._meta.fields),
+        tuple(sorted(desc_i18n.items())),
+        file_key,
+    )
+
+
+def get_index_fields(script, desc_i18n):
+    """
+    Return the fields of a script in the index (except id), as a list of
+    tuples (key, value), desc_i18n being the translated descriptions:
+    {lang: desc}.
+    """
+    fields = []
+    for field in script._meta.fields:
+        key = field.attname
+        value = getattr(script, key)
+        value_i18n = []
+        if key in ['id', 'visible', 'comment']:
+            continue
+        if value is None:
+            value = ''
+        else:
+            if key == 'url':
+                # FIXME: use the "Host" from request, but…
+                # request is not available in this handler!
+                value = ('https://weechat.org/%s' %
+                         script.build_url()[1:])
+            elif key == 'mail':
+                value = value.replace('@', ' [at] ')
+                value = value.replace('.', ' [dot] ')
+            elif key == 'md5sum':
+                value = script.md5()
+            elif key.startswith('desc'):
+                if key == 'desc_en':
+                    for lang in get_translated_langs():
+                        value_i18n.append((
+                            'desc_%s' % settings.LANGUAGES_LOCALES[lang],
+                            escape(desc_i18n[lang]),
+                        ))
+                value = escape(value)
+        fields.extend([(key, value)] + value_i18n)
+    return fields
+
+
+def build_index_fragment(script, desc_i18n):
+    """
+    Return a tuple (xml, json) with the script in plugins.{xml,json},
+    desc_i18n being the translated descriptions: {lang: desc}.
+    """
+    xml = ['  <plugin id="%s">\n' % script.id]
+    json_lines = ['    "id": "%s"' % script.id]
+    for key, value in get_index_fields(script, desc_i18n):
+        xml.append(getxmlline(key, value))
+        json_lines.append(getjsonline(key, value)[:-2])
+    xml.append('  </plugin>\n')
+    return (''.join(xml), '  {\n%s\n  }' % ',\n'.join(json_lines))
+
+
+def get_index_fragment(script, desc_i18n):
+    """
+    Return a tuple (xml, json) with the script in plugins.{xml,json},
+    using the cached fragment if the script has not changed.
+    """
+    key = get_index_fragment_key(script, desc_i18n)
+    fragment = INDEX_FRAGMENTS.get(script.id)
+    if fragment is None or fragment[0] != key:
+        fragment = (key,) + build_index_fragment(script, desc_i18n)
+        INDEX_FRAGMENTS[script.id] = fragment
+    return fragment[1:]
+
+
+def build_scripts_files():
+    """Build files plugins.{xml,json}(.gz) and _i18n_scripts.py."""
     strings = []
-    for script in Script.objects.filter(visible=1).order_by('id'):
-        if script.visible and not script.is_legacy():
-            xml += '  <plugin id="%s">\n' % script.id
-            json += '  {\n'
-            json += '    "id": "%s",\n' % script.id
-            for key, value in script.__dict__.items():
-                value_i18n = {}
-                if key not in ['_state', 'id', 'visible', 'comment']:
-                    if value is None:
-                        value = ''
-                    else:
-                        if key == 'url':
-                            # FIXME: use the "Host" from request, but…
-                            # request is not available in this handler!
-                            value = ('https://weechat.org/%s' %
-                                     script.build_url()[1:])
-                        elif key == 'mail':
-                            value = value.replace('@', ' [at] ')
-                            value = value.replace('.', ' [dot] ')
-                        elif key == 'md5sum':
-                            value = script.md5()
-                        elif key.startswith('desc'):
-                            if key == 'desc_en':
-                                for lang, locale in \
-                                        settings.LANGUAGES_LOCALES.items():
-                                    if lang[0:2] != 'en':
-                                        translation.activate(lang)
-                                        value_i18n['desc_%s' % locale] = \
-                                            escape(ugettext(value))
-                                        translation.deactivate()
-                            value = escape(value)
-                    xml += getxmlline(key, value)
-                    json += getjsonline(key, value)
-                    for field in value_i18n:
-                        xml += getxmlline(field, value_i18n[field])
-                        json += getjsonline(field, value_i18n[field])
-            xml += '  </plugin>\n'
-            json = json[:-2] + '\n  },\n'
+    script_ids = set()
+    translations = get_scripts_translations()
+    with IndexWriter('plugins', 'plugins') as index:
+        for script in (Script.objects.filter(visible=1).order_by('id')
+                       .iterator()):
+            if script.is_legacy():
+                continue
+            index.add(*get_index_fragment(
+                script, get_script_desc_i18n(script, translations)))
+            script_ids.add(script.id)
             strings.append(
                 (
                     script.desc_en,
@@ -455,34 +661,175 @@ def handler_script_changed(sender, **kwargs):
                         script.name_with_extension(),
                         script.version_weechat()),
                 ))
-    xml += '</plugins>\n'
-    json = json[:-2] + '\n]\n'
-
-    # create plugins.xml
-    filename = files_path_join('plugins.xml')
-    with open(filename, 'w', encoding='utf-8') as _file:
-        _file.write(xml)
-
-    # create plugins.xml.gz
-    with open(filename, 'rb') as _f_in:
-        _f_out = gzip.open(filename + '.gz', 'wb')
-        _f_out.writelines(_f_in)
-        _f_out.close()
-
-    # create plugins.json
-    filename = files_path_join('plugins.json')
-    with open(filename, 'w', encoding='utf-8') as _file:
-        _file.write(json)
-
-    # create plugins.json.gz
-    with open(filename, 'rb') as _f_in:
-        _f_out = gzip.open(filename + '.gz', 'wb')
-        _f_out.writelines(_f_in)
-        _f_out.close()
+
+    # drop fragments of scripts removed from the index
+    for script_id in set(INDEX_FRAGMENTS) - script_ids:
+        del INDEX_FRAGMENTS[script_id]
 
     # create _i18n_scripts.py
     i18n_autogen('scripts', 'scripts', strings)
 
+    # purge the oldest changes
+    serial = get_scripts_serial()
+    ScriptChange.objects.filter(
+        serial__lte=serial - SCRIPT_CHANGES_KEEP).delete()
 
+    touch_version('scripts')
+
+
+class ScriptChange(models.Model):
+    """
+    A change in the scripts index (script added, updated or deleted),
+    with a serial number incremented on each change.
+    """
+    ACTION_CHOICES = (
+        ('add', 'add'),
+        ('update', 'update'),
+        ('delete', 'delete'),
+    )
+    serial = models.AutoField(primary_key=True)
+    script_id = models.IntegerField(db_index=True)
+    name = models.CharField(max_length=MAX_LENGTH_NAME + 8)
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '%d: %s %s' % (self.serial, self.action, self.name)
+
+    def __unicode__(self):  # python 2.x
+        return self.__str__()
+
+    class Meta:
+        ordering = ['serial']
+
+
+def get_scripts_serial():
+    """Return serial of the last change in scripts index (0 if none)."""
+    return ScriptChange.objects.aggregate(
+        serial=Max('serial'))['serial'] or 0
+
+
+def get_scripts_delta_since(since, serial):
+    """
+    Return the serial from which the delta is computed: "since", or None
+    if all scripts must be returned ("since" is None, invalid, or the
+    changes since this serial are not available any more).
+    """
+    if since is None or since > serial:
+        return None
+    oldest = ScriptChange.objects.aggregate(serial=Min('serial'))['serial']
+    if oldest is not None and since < oldest - 1:
+        return None
+    return since
+
+
+def get_scripts_delta(since, serial):
+    """
+    Return the scripts changed after serial "since" (up to "serial") as
+    JSON: the scripts added or updated (same fields as in plugins.json)
+    and the names of scripts removed from the index.
+
+    All the scripts are returned (with "full": true) if "since" is None
+    (see get_scripts_delta_since()).
+    """
+    scripts = (Script.objects.filter(visible=1)
+               .exclude(max_weechat='0.2.6')
+               .order_by('id'))
+    removed = []
+    full = since is None
+    if not full:
+        changes = ScriptChange.objects.filter(serial__gt=since,
+                                              serial__lte=serial)
+        script_ids = set()
+        removed_names = set()
+        for change in changes:
+            if change.action == 'delete':
+                removed_names.add(change.name)
+            else:
+                script_ids.add(change.script_id)
+        scripts = list(scripts.filter(id__in=list(script_ids)))
+        removed = sorted(
+            removed_names -
+            set(script.name_with_extension() for script in scripts))
+    translations = get_scripts_translations(
+        None if full else [script.id for script in scripts])
+    plugins = []
+    for script in scripts:
+        plugins.append(OrderedDict(
+            [('id', '%s' % script.id)] +
+            [(key, '%s' % value)
+             for key, value in get_index_fields(
+                 script, get_script_desc_i18n(script, translations))]))
+    return json.dumps(OrderedDict([
+        ('serial', serial),
+        ('full', full),
+        ('removed', removed),
+        ('plugins', plugins),
+    ]), indent=2, separators=(',', ': ')) + '\n'
+
+
+register_build('scripts', build_scripts_files)
+register_build('scripts_i18n', build_scripts_i18n)
+register_build('scripts_tags', build_scripts_tags)
+
+
+@disable_for_loaddata
+def handler_script_saved(sender, **kwargs):
+    """Update tags and translated descriptions of a script after update."""
+    script = kwargs['instance']
+    with transaction.atomic():
+        ScriptTag.objects.filter(script=script).delete()
+        ScriptTag.objects.bulk_create(get_script_tags([script]))
+        ScriptTranslation.objects.filter(script=script).delete()
+        ScriptTranslation.objects.bulk_create(translate_scripts([script]))
+    touch_version_on_commit('scripts')
+
+
+@disable_for_loaddata
+def handler_script_presave(sender, **kwargs):
+    """Remember the name of script in the index before update."""
+    script = kwargs['instance']
+    script.previous_indexed_name = None
+    if script.pk is None:
+        return
+    previous = Script.objects.filter(pk=script.pk).first()
+    if previous is not None and previous.is_indexed():
+        script.previous_indexed_name = previous.name_with_extension()
+
+
+@disable_for_loaddata
+def handler_script_changed(sender, **kwargs):
+    """
+    Log the changes in the index and build scripts files after
+    update/delete of a script.
+
+    A script renamed or removed from the index is logged as deleted with
+    its previous name; a script which is not in the index (hidden or
+    legacy) is not logged.
+    """
+    script = kwargs['instance']
+    INDEX_FRAGMENTS.pop(script.id, None)
+    if kwargs['signal'] is post_delete:
+        previous_name = (script.name_with_extension()
+                         if script.is_indexed() else None)
+        name = None
+        touch_version_on_commit('scripts')
+    else:
+        previous_name = getattr(script, 'previous_indexed_name', None)
+        name = script.name_with_extension() if script.is_indexed() else None
+    if previous_name and previous_name != name:
+        ScriptChange.objects.create(script_id=script.id,
+                                    name=previous_name,
+                                    action='delete')
+    if name:
+        ScriptChange.objects.create(
+            script_id=script.id,
+            name=name,
+            action='update' if previous_name == name else 'add')
+    schedule_build('scripts')
+
+
+pre_save.connect(handler_script_presave, sender=Script)
+post_save.connect(handler_script_saved, sender=Script)
 post_save.connect(handler_script_changed, sender=Script)
 post_delete.connect(handler_script_changed, sender=Script)
@@ -32,6 +32,7 @@ from weechat.scripts.views import (
     form_update as view_form_update,
     pending as view_pending,
     python3 as view_python3,
+    delta as view_delta,
 )
 
 urlpatterns = [
@@ -60,6 +61,7 @@ urlpatterns = [
     url(r'^update/$', view_form_update, name='scripts_update'),
     url(r'^pending/$', view_pending, name='scripts_pending'),
     url(r'^python3/$', view_python3, name='scripts_python3'),
+    url(r'^delta/$', view_delta, name='scripts_delta'),
     url(r'^addok/$',
         TemplateView.as_view(template_name='scripts/add_ok.html')),
     url(r'^adderror/$',
@@ -21,22 +21,33 @@
 """Views for "scripts" menu."""
 
 from datetime import datetime
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name
 
 from django.conf import settings
 from django.core.mail import EmailMessage
-from django.http import HttpResponseRedirect, Http404
+from django.db.models import Count, Prefetch
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    Http404,
+)
 from django.shortcuts import render, get_object_or_404
+from django.utils.translation import get_language
 
-from weechat.common.path import files_path_join
-from weechat.download.models import Release
+from weechat.common.cache import get_cache_key, get_cached, get_version
+from weechat.common.highlight import highlight_file
+from weechat.common.path import files_path_join, get_file_key
+from weechat.download.models import get_release
 from weechat.scripts.models import (
     Script,
+    ScriptTag,
+    ScriptTranslation,
     ScriptFormAdd,
     ScriptFormUpdate,
     get_language_from_extension,
+    get_scripts_delta,
+    get_scripts_delta_since,
+    get_scripts_serial,
 )
 
 API_OLD = '0.2.6'
@@ -46,17 +57,6 @@ API_STABLE = '0.3.0'
 KEY_ORDER_BY_DESC = ['popularity', 'min_weechat', 'max_weechat', 'added',
                      'updated']
 
-PYGMENTS_LEXER = {
-    'pl': 'perl',
-    'py': 'python',
-    'rb': 'ruby',
-    'lua': 'lua',
-    'tcl': 'tcl',
-    'scm': 'scheme',
-    'js': 'javascript',
-    'php': 'php',
-}
-
 
 def get_sort_key(sort_key):
     """Get sort keys to sort scripts (in SQL request)."""
@@ -69,12 +69,51 @@ def get_sort_key(sort_key):
     return keys
 
 
-def get_highlighted_source(source, language):
-    """Get source highlighted with pygments."""
-    return highlight(source,
-                     get_lexer_by_name(language, stripnl=True,
-                                       encoding='utf-8'),
-                     HtmlFormatter(cssclass='pygments', linenos='table'))
+def get_facets(script_list):
+    """
+    Return number of scripts by language, license and tag (used to filter
+    scripts), as a dictionary with keys "languages", "licenses" and "tags".
+    """
+    script_list = script_list.order_by()
+    languages = {
+        item['language']: item['count']
+        for item in (script_list.values('language')
+                     .annotate(count=Count('id')))
+    }
+    if 'python' in languages:
+        python3 = (script_list.filter(language='python')
+                   .filter(tag_set__tag='py3k-ok').count())
+        if python3 > 0:
+            languages['python3-compatible'] = python3
+        if python3 < languages['python']:
+            languages['python2-only'] = languages['python'] - python3
+    licenses = {
+        item['license']: item['count']
+        for item in (script_list.values('license')
+                     .annotate(count=Count('id')))
+    }
+    tags = {
+        item['tag']: item['count']
+        for item in (ScriptTag.objects.filter(script__in=script_list)
+                     .values('tag').annotate(count=Count('id')))
+    }
+    return {
+        'languages': languages,
+        'licenses': licenses,
+        'tags': tags,
+    }
+
+
+def prefetch_translations(script_list):
+    """
+    Prefetch translated descriptions of scripts in the current language
+    (used by Script.desc_i18n).
+    """
+    return script_list.prefetch_related(
+        Prefetch('translations',
+                 queryset=ScriptTranslation.objects.filter(
+                     lang=get_language()),
+                 to_attr='translations_lang'))
 
 
 def scripts(request, api='stable', sort_key='popularity', filter_name='',
@@ -96,36 +135,31 @@ def scripts(request, api='stable', sort_key='popularity', filter_name='',
                        .filter(min_weechat__gte=API_STABLE)
                        .order_by(*get_sort_key(sort_key)))
     if filter_name == 'tag':
-        script_list = (script_list
-                       .filter(tags__regex=r'(^|,)%s($|,)' % filter_value))
+        script_list = script_list.filter(tag_set__tag=filter_value)
     elif filter_name == 'language':
         if filter_value == 'python2-only':
             script_list = (script_list
                            .filter(language='python')
-                           .exclude(tags__regex=r'(^|,)py3k-ok($|,)'))
+                           .exclude(tag_set__tag='py3k-ok'))
         elif filter_value == 'python3-compatible':
             script_list = (script_list
                            .filter(language='python')
-                           .filter(tags__regex=r'(^|,)py3k-ok($|,)'))
+                           .filter(tag_set__tag='py3k-ok'))
         else:
             script_list = script_list.filter(language=filter_value)
     elif filter_name == 'license':
         script_list = script_list.filter(license=filter_value)
     elif filter_name == 'author':
         script_list = script_list.filter(author=filter_value)
-    languages = {}
-    licenses = {}
-    tags = {}
-    for script in script_list:
-        languages[script.language] = languages.get(script.language, 0) + 1
-        if script.language == 'python':
-            language = ('python3-compatible' if script.is_py3k_ok()
-                        else 'python2-only')
-            languages[language] = languages.get(language, 0) + 1
-        licenses[script.license] = licenses.get(script.license, 0) + 1
-        if script.tags:
-            for tag in script.tagslist():
-                tags[tag] = tags.get(tag, 0) + 1
+    # facets are validated by the index and by the version of scripts
+    # (changed also when only tags change, without update of the index)
+    facets = get_cached(
+        get_cache_key('scripts_facets', api, filter_name, filter_value),
+        (get_file_key(files_path_join('plugins.xml')),
+         get_version('scripts')),
+        lambda: get_facets(script_list),
+    )
+    script_list = prefetch_translations(script_list)
     script_filters_displayed, script_filters_sort = (
         request.COOKIES.get('script_filters', '0_name').split('_'))
     if script_filters_sort == 'popularity':
@@ -143,9 +177,10 @@ def scripts(request, api='stable', sort_key='popularity', filter_name='',
             'filter_value': filter_value,
             'script_filters_displayed': int(script_filters_displayed),
             'script_filters_sort': script_filters_sort,
-            'languages': sorted(languages.items(), key=sort_function),
-            'licenses': sorted(licenses.items(), key=sort_function),
-            'tags': sorted(tags.items(), key=sort_function),
+            'languages': sorted(facets['languages'].items(),
+                                key=sort_function),
+            'licenses': sorted(facets['licenses'].items(), key=sort_function),
+            'tags': sorted(facets['tags'].items(), key=sort_function),
         },
     )
 
@@ -156,11 +191,9 @@ def script_source(request, api='stable', scriptid='', scriptname=''):
     if scriptid:
         script = get_object_or_404(Script, id=scriptid)
         try:
-            with open(files_path_join(script.path(),
-                                      script.name_with_extension()),
-                      'rb') as _file:
-                htmlsource = get_highlighted_source(_file.read(),
-                                                    script.language)
+            htmlsource = highlight_file(
+                files_path_join(script.path(), script.name_with_extension()),
+                script.pygments_lexer())
         except:  # noqa: E722
             raise Http404
     else:
@@ -185,11 +218,9 @@ def script_source(request, api='stable', scriptid='', scriptname=''):
                 min_weechat__gte=API_STABLE,
             )
         try:
-            with open(files_path_join(script.path(),
-                                      script.name_with_extension()),
-                      'rb') as _file:
-                htmlsource = get_highlighted_source(_file.read(),
-                                                    PYGMENTS_LEXER[sext])
+            htmlsource = highlight_file(
+                files_path_join(script.path(), script.name_with_extension()),
+                script.pygments_lexer())
         except:  # noqa: E722
             raise Http404
     return render(
@@ -338,8 +369,9 @@ def form_update(request):
 
 def pending(request):
     """Page with scripts pending for approval."""
-    script_list = (Script.objects.filter(visible=0)
-                   .filter(min_weechat__gte=API_STABLE).order_by('-added'))
+    script_list = prefetch_translations(
+        Script.objects.filter(visible=0)
+        .filter(min_weechat__gte=API_STABLE).order_by('-added'))
     return render(
         request,
         'scripts/pending.html',
@@ -351,7 +383,7 @@ def pending(request):
 
 def python3(request):
     """Page with Python 3 transition."""
-    v037_date = Release.objects.get(version='0.3.7').date
+    v037_date = get_release('0.3.7').date
     v037_date = datetime(
         year=v037_date.year,
         month=v037_date.month,
@@ -377,7 +409,7 @@ def python3(request):
     scripts_ok = (Script.objects.filter(visible=1)
                   .filter(min_weechat__gte=API_STABLE)
                   .filter(language='python')
-                  .filter(tags__regex=r'(^|,)py3k-ok($|,)')
+                  .filter(tag_set__tag='py3k-ok')
                   .count())
     scripts_remaining = python_scripts - scripts_ok
     status_list.append({
@@ -424,3 +456,35 @@ def python3(request):
             'status_list': status_list,
         },
     )
+
+
+def delta(request):
+    """
+    Changes in scripts index (JSON) since the serial given in parameter
+    "since" or in header "If-None-Match" (ETag of a previous answer);
+    all scripts are returned if no serial is given.
+
+    The answer is "304 Not Modified" only for a conditional request with
+    the current ETag.
+    """
+    serial = get_scripts_serial()
+    etag = '"%d"' % serial
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '').strip()
+    if if_none_match.startswith('W/'):
+        if_none_match = if_none_match[2:]
+    since = request.GET.get('since', if_none_match.strip('"') or None)
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        since = None
+    if if_none_match == etag:
+        response = HttpResponseNotModified()
+    else:
+        # all full answers have the same cache key
+        since = get_scripts_delta_since(since, serial)
+        response = HttpResponse(
+            get_cached(get_cache_key('scripts_delta', since), serial,
+                       lambda: get_scripts_delta(since, serial)),
+            content_type='application/json')
+    response['ETag'] = etag
+    return response
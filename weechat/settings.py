@@ -66,6 +66,10 @@ MEDIA_URL = '/media/'
 FILES_ROOT = os.path.normpath(os.path.join(BASE_DIR, '..', 'files'))
 FILES_URL = '/files/'
 
+# max size of cache for sources highlighted with pygments (in bytes),
+# in directory "cache/highlight" of FILES_ROOT
+HIGHLIGHT_CACHE_SIZE = 64 * 1024 * 1024
+
 STATIC_URL = '/static/'
 
 REPO_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', 'repo'))
@@ -20,8 +20,6 @@
 
 """Models for "themes" menu."""
 
-import gzip
-from hashlib import md5
 from io import open
 import os
 import re
@@ -29,11 +27,11 @@ import tarfile
 from xml.sax.saxutils import escape
 
 from django import forms
-from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_save, post_delete
 from django.utils.translation import ugettext, ugettext_lazy
 
+from weechat.common.build import register_build, schedule_build
 from weechat.common.decorators import disable_for_loaddata
 from weechat.common.forms import (
     CharField,
@@ -46,8 +44,10 @@ from weechat.common.forms import (
     getxmlline,
     getjsonline,
 )
+from weechat.common.index import AtomicFile, IndexWriter
+from weechat.common.models import FileDigest
 from weechat.common.path import files_path_join
-from weechat.download.models import Release
+from weechat.download.models import get_release
 
 MAX_LENGTH_NAME = 64
 MAX_LENGTH_VERSION = 32
@@ -110,10 +110,23 @@ class Theme(models.Model):
         """Return URL to the theme."""
         return '/files/%s/%s' % (self.path(), self.name)
 
+    def filename(self):
+        """Return theme filename (on disk)."""
+        return files_path_join(self.path(), os.path.basename(self.name))
+
     def file_exists(self):
         """Checks if the theme exists (on disk)."""
-        return os.path.isfile(files_path_join(self.path(),
-                                              os.path.basename(self.name)))
+        return os.path.isfile(self.filename())
+
+    def md5(self):
+        """Return MD5 checksum of theme."""
+        digest = FileDigest.get(self.filename())
+        return digest.md5 if digest else ''
+
+    def sha256(self):
+        """Return SHA-256 checksum of theme."""
+        digest = FileDigest.get(self.filename())
+        return digest.sha256 if digest else ''
 
     @staticmethod
     def get_props(themestring):
@@ -190,8 +203,8 @@ class ThemeFormAdd(Form):
         if not re.search('^[A-Za-z0-9_]+$', shortname):
             raise forms.ValidationError(
                 ugettext('Invalid name inside theme file.'))
-        release_stable = Release.objects.get(version='stable')
-        release_devel = Release.objects.get(version='devel')
+        release_stable = get_release('stable')
+        release_devel = get_release('devel')
         if props['weechat'] not in (release_stable.description,
                                     re.sub('-.*', '',
                                            release_devel.description)):
@@ -269,8 +282,8 @@ class ThemeFormUpdate(Form):
         if props['name'] != theme.name:
             raise forms.ValidationError(
                 ugettext('Invalid name: different from theme.'))
-        release_stable = Release.objects.get(version='stable')
-        release_devel = Release.objects.get(version='devel')
+        release_stable = get_release('stable')
+        release_devel = get_release('devel')
         if props['weechat'] not in (release_stable.description,
                                     re.sub('-.*', '',
                                            release_devel.description)):
@@ -292,81 +305,66 @@ def json_value(key, value):
         key, value.replace('"', '\\"').replace("'", "\\'"))
 
 
-@disable_for_loaddata
-def handler_theme_changed(sender, **kwargs):
-    """Build files themes.{xml,json}(.gz) after update/delete of a theme."""
-    theme_list = Theme.objects.filter(visible=1).order_by('id')
-    xml = '<?xml version="1.0" encoding="utf-8"?>\n'
-    xml += '<themes>\n'
-    json = '[\n'
-    for theme in theme_list:
-        if theme.visible:
-            xml += '  <theme id="%s">\n' % theme.id
-            json += '  {\n'
-            json += '    "id": "%s",\n' % theme.id
-            for key, value in theme.__dict__.items():
-                if key not in ['_state', 'id', 'visible', 'comment']:
-                    if value is None:
-                        value = ''
-                    else:
-                        if key == 'mail':
-                            value = value.replace('@', ' [at] ')
-                            value = value.replace('.', ' [dot] ')
-                        elif key == 'md5sum':
-                            try:
-                                with open(files_path_join(theme.path(),
-                                                          theme.name),
-                                          'rb') as _file:
-                                    filemd5 = md5()
-                                    filemd5.update(_file.read())
-                                    value = filemd5.hexdigest()
-                            except:  # noqa: E722
-                                value = ''
-                        elif key.startswith('desc'):
-                            value = escape(value)
-                    strvalue = '%s' % value
-                    xml += getxmlline(key, strvalue)
-                    json += getjsonline(key, strvalue)
-            # FIXME: use the "Host" from request, but…
-            # request is not available in this handler!
-            strvalue = 'https://weechat.org/%s' % theme.build_url()[1:]
-            xml += '    %s\n' % xml_value('url', strvalue)
-            json += '    %s\n' % json_value('url', strvalue)
-            xml += '  </theme>\n'
-            json = json[:-2] + '\n  },\n'
-    xml += '</themes>\n'
-    json = json[:-2] + '\n]\n'
-
-    # create themes.xml
-    filename = files_path_join('themes.xml')
-    with open(filename, 'w', encoding='utf-8') as _file:
-        _file.write(xml)
-
-    # create themes.xml.gz
-    with open(filename, 'rb') as _f_in:
-        _f_out = gzip.open(filename + '.gz', 'wb')
-        _f_out.writelines(_f_in)
-        _f_out.close()
-
-    # create themes.json
-    filename = files_path_join('themes.json')
-    with open(filename, 'w', encoding='utf-8') as _file:
-        _file.write(json)
-
-    # create themes.json.gz
-    with open(filename, 'rb') as _f_in:
-        _f_out = gzip.open(filename + '.gz', 'wb')
-        _f_out.writelines(_f_in)
-        _f_out.close()
+def build_index_fragment(theme):
+    """Return a tuple (xml, json) with the theme in themes.{xml,json}."""
+    xml = ['  <theme id="%s">\n' % theme.id]
+    json = ['    "id": "%s"' % theme.id]
+    for field in theme._meta.fields:
+        key = field.attname
+        value = getattr(theme, key)
+        if key in ['id', 'visible', 'comment']:
+            continue
+        if value is None:
+            value = ''
+        else:
+            if key == 'mail':
+                value = value.replace('@', ' [at] ')
+                value = value.replace('.', ' [dot] ')
+            elif key == 'md5sum':
+                value = theme.md5()
+            elif key.startswith('desc'):
+                value = escape(value)
+        strvalue = '%s' % value
+        xml.append(getxmlline(key, strvalue))
+        json.append(getjsonline(key, strvalue)[:-2])
+    # FIXME: use the "Host" from request, but…
+    # request is not available in this handler!
+    strvalue = 'https://weechat.org/%s' % theme.build_url()[1:]
+    xml.append('    %s\n' % xml_value('url', strvalue))
+    json.append('    %s' % json_value('url', strvalue)[:-1])
+    xml.append('  </theme>\n')
+    return (''.join(xml), '  {\n%s\n  }' % ',\n'.join(json))
+
+
+def build_themes_files():
+    """Build files themes.{xml,json}(.gz) and themes.tar.bz2."""
+    with IndexWriter('themes', 'themes') as index:
+        for theme in Theme.objects.filter(visible=1).order_by('id').iterator():
+            index.add(*build_index_fragment(theme))
 
     # create themes.tar.bz2 (with theme.xml + 'themes' directory)
-    os.chdir(settings.FILES_ROOT)
-    tar = tarfile.open(files_path_join('themes.tar.bz2'), 'w:bz2')
-    tar.add('themes.xml')
-    for name in os.listdir(files_path_join('themes')):
-        if name.endswith('.theme'):
-            tar.add('themes/%s' % name)
-    tar.close()
+    tarball = AtomicFile(files_path_join('themes.tar.bz2'))
+    try:
+        tar = tarfile.open(mode='w:bz2', fileobj=tarball.file)
+        tar.add(files_path_join('themes.xml'), arcname='themes.xml')
+        for name in sorted(os.listdir(files_path_join('themes'))):
+            if name.endswith('.theme'):
+                tar.add(files_path_join('themes', name),
+                        arcname='themes/%s' % name)
+        tar.close()
+    except:  # noqa: E722
+        tarball.discard()
+        raise
+    tarball.publish()
+
+
+register_build('themes', build_themes_files)
+
+
+@disable_for_loaddata
+def handler_theme_changed(sender, **kwargs):
+    """Build themes files after update/delete of a theme."""
+    schedule_build('themes')
 
 
 post_save.connect(handler_theme_changed, sender=Theme)
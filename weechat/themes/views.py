@@ -21,9 +21,6 @@
 """Views for "themes" menu."""
 
 from datetime import datetime
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
@@ -31,8 +28,9 @@ from django.core.mail import EmailMessage
 from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import render, get_object_or_404
 
+from weechat.common.highlight import highlight_file
 from weechat.common.path import files_path_join
-from weechat.download.models import Release
+from weechat.download.models import get_release
 from weechat.themes.models import Theme, ThemeFormAdd, ThemeFormUpdate
 
 # list of keys that are sorted by default using descending order
@@ -65,12 +63,8 @@ def theme_source(request, themeid=None, themename=None):
     else:
         theme = get_object_or_404(Theme, name=themename)
     try:
-        with open(files_path_join(theme.path(), theme.name), 'rb') as _file:
-            htmlsource = highlight(_file.read(),
-                                   get_lexer_by_name('ini', stripnl=True,
-                                                     encoding='utf-8'),
-                                   HtmlFormatter(cssclass='pygments',
-                                                 linenos='table'))
+        htmlsource = highlight_file(
+            files_path_join(theme.path(), theme.name), 'ini')
     except:  # noqa: E722
         raise Http404
     return render(
@@ -142,8 +136,7 @@ def form_add(request):
     else:
         form = ThemeFormAdd()
     try:
-        stable_version = Release.objects.get(version='stable').description
-        release_stable = Release.objects.get(version=stable_version)
+        release_stable = get_release(get_release('stable').description)
     except ObjectDoesNotExist:
         release_stable = None
     return render(